@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+
+from app.models.models import Ad
+from app.schemas.general import AdSchema
+from app.settings.base import settings
+
+
+class AdPool:
+    """
+    行程內的廣告池
+
+    第一次使用時載入所有廣告並建立alias table，之後每次抽樣都是O(1)且不用查資料庫
+    管理員修改廣告後會立即重新載入，其他worker則在ad_pool_ttl_seconds後自行重新載入
+    weight小於等於0的廣告視為暫停投放
+    """
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        self.table: tuple[list[AdSchema], list[float], list[int]] = ([], [], [])
+        self.loaded_at: float | None = None
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def _load(self, db: Session):
+        ads = [AdSchema.model_validate(ad, from_attributes=True) for ad in db.query(Ad).filter(Ad.weight > 0).order_by(desc(Ad.id))]
+        self.table = (ads, *build_alias_table([ad.weight for ad in ads]))
+        self.loaded_at = time.monotonic()
+
+    def load(self, db: Session):
+        with self.lock:
+            self._load(db)
+
+    def sample(self, db: Session, k: int) -> list[AdSchema]:
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self._load(db)
+        ads, probabilities, aliases = self.table
+        if len(ads) <= k:
+            return random.sample(ads, len(ads))
+        selected: dict[int, None] = {}
+        for _ in range(k * 10):
+            selected[draw(probabilities, aliases)] = None
+            if len(selected) == k:
+                break
+        #權重極度不平均時重複抽中的機率高，剩下的名額平均補足
+        if len(selected) < k:
+            rest = [i for i in range(len(ads)) if i not in selected]
+            selected.update(dict.fromkeys(random.sample(rest, k - len(selected))))
+        return [ads[i] for i in selected]
+
+
+def build_alias_table(weights: list[float]) -> tuple[list[float], list[int]]:
+    #Vose's alias method
+    n = len(weights)
+    if n == 0:
+        return [], []
+    total = sum(weights)
+    scaled = [weight * n / total for weight in weights]
+    probabilities = [1.0] * n
+    aliases = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        probabilities[less] = scaled[less]
+        aliases[less] = more
+        scaled[more] = scaled[more] + scaled[less] - 1.0
+        (small if scaled[more] < 1.0 else large).append(more)
+    return probabilities, aliases
+
+def draw(probabilities: list[float], aliases: list[int]) -> int:
+    i = random.randrange(len(probabilities))
+    return i if random.random() < probabilities[i] else aliases[i]
+
+
+ad_pool = AdPool(ttl_seconds=settings.ad_pool_ttl_seconds)
@@ -1,19 +1,46 @@
+import json
+
+from functools import partial
+
 from typing import Annotated
 
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import create_engine, event, update
 
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
 
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 from app.models.models import Base, User, City, District, Store, Item, Order, CartItem, Comment
 from app.exceptions.base import UnauthenticatedException, ModelNotFoundException, PermissionException
+from app.dependencies.principal import principal_cache
+from app.dependencies.password_hasher import password_hasher
+from app.schemas.general import PrincipalSchema
 from app.settings.base import settings
 
 
+def apply_sqlite_profile(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA temp_store={settings.sqlite_temp_store}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if settings.sqlite_foreign_keys else 'OFF'}")
+    cursor.close()
+
+def capture_statement(conn, cursor, statement, parameters, context, executemany):
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    with open(settings.sql_capture_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"statement": statement, "parameters": parameters}, ensure_ascii=False, default=str) + "\n")
+
+def to_async_db_connection(db_connection: str) -> str:
+    return db_connection.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
 engine = create_engine(settings.db_connection)
 SessionLocal = sessionmaker(engine, autoflush=False)
 
@@ -26,24 +53,69 @@ async def get_db():
     finally:
         db.close()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+async_engine = create_async_engine(settings.async_db_connection or to_async_db_connection(settings.db_connection))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+#沒有設定唯讀資料庫時，讀取一律走主資料庫
+if settings.read_db_connection:
+    read_engine = create_engine(settings.read_db_connection)
+    async_read_engine = create_async_engine(settings.async_read_db_connection or to_async_db_connection(settings.read_db_connection))
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+ReadSessionLocal = sessionmaker(read_engine, autoflush=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
+async def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+if settings.sqlite_profile_enabled:
+    for sqlite_engine in {engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine}:
+        if sqlite_engine.dialect.name == "sqlite":
+            event.listen(sqlite_engine, "connect", apply_sqlite_profile)
+
+#開發時記錄實際送出的SQL，供explain_queries.py分析
+if settings.sql_capture_file:
+    for captured_engine in {engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine}:
+        event.listen(captured_engine, "before_cursor_execute", capture_statement)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_and_update(plain_password, hashed_password)[0]
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str):
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    db.execute(update(User).where(User.id == user_id).values(password=hashed_password))
+
+def authenticate_user(db: Session, username: str, password: str, write):
     user = get_user(db=db, username=username)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    valid, new_hash = password_hasher.verify_and_update(password, user.password)
+    if not valid:
         return False
+    if new_hash is not None:
+        #bcrypt成本設定改變時，登入成功後以新的成本重新雜湊，和其他寫入一樣經過write
+        write(partial(update_password_hash, user_id=user.id, hashed_password=new_hash))
+        principal_cache.invalidate(user.username)
     return user
 
 def create_token(data: dict):
@@ -62,8 +134,7 @@ def get_user_no_exc(token: Annotated[str, Depends(oauth2_scheme)], db: Session =
             return None
     except JWTError:
         return None
-    user = db.query(User).filter(User.username == username).first()
-    return user
+    return principal_cache.get(db, username)
 
 def get_current_user(user: User | None = Depends(get_user_no_exc)) -> User:
     '''
@@ -103,6 +174,29 @@ def get_current_user_by_refresh_token(token: Annotated[str, Depends(oauth2_schem
         raise UnauthenticatedException()
     return user
 
+def get_current_principal(token: Annotated[str, Depends(oauth2_scheme)]) -> PrincipalSchema:
+    '''
+    給只需要user.id的路由使用，不載入完整的User
+    token只證明發行當時的身分，另外經由principal_cache確認使用者仍然存在，快取命中時不查詢資料庫，
+    所以在其他worker刪除、改名或修改權限的使用者，最多principal_cache_ttl_seconds後就會生效
+    '''
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        if payload.get("for") != "access":
+            raise UnauthenticatedException()
+        username: str = payload.get("sub")
+        user_id: int = payload.get("uid")
+        if not username or user_id is None:
+            raise UnauthenticatedException()
+    except JWTError:
+        raise UnauthenticatedException()
+    if principal_cache.is_revoked(user_id):
+        raise UnauthenticatedException()
+    current = principal_cache.claims(SessionLocal, username)
+    if current is None or current[0] != user_id:
+        raise UnauthenticatedException()
+    return PrincipalSchema(id=user_id, username=username, is_admin=current[1])
+
 def get_current_admin_user(user: User = Depends(get_current_user)):
     if not user.is_admin:
         raise PermissionException()
@@ -0,0 +1,62 @@
+import hashlib
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+
+"""
+條件式GET
+
+以資源的版本(修改時間、子資源數量等)產生ETag與Last-Modified，
+在載入與序列化ORM物件之前先比對If-None-Match/If-Modified-Since，相同時直接回304
+"""
+
+def make_etag(*parts) -> str:
+    return f'"{hashlib.sha256(repr(parts).encode()).hexdigest()[:32]}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in header.split(",")]
+
+def to_http_date(value: datetime) -> str:
+    #資料庫存的是本地時間
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.astimezone(timezone.utc).replace(microsecond=0) <= since
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> dict[str, str]:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = to_http_date(last_modified)
+    return headers
+
+def not_modified_response(etag: str, last_modified: datetime | None = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+def conditional_get(request: Request, response: Response, version) -> Response | None:
+    """
+    version為版本查詢的結果列，回傳304回應或None
+    回傳None時已在response加上ETag與Last-Modified，路由照常回傳資料即可
+    """
+    etag = make_etag(request.url.path, request.url.query, *version)
+    last_modified = max((value for value in version if isinstance(value, datetime)), default=None)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers.update(validator_headers(etag, last_modified))
+    return None
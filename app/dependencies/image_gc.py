@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import os
+import time
+
+from datetime import datetime, timedelta
+from functools import partial
+
+from sqlalchemy.orm import Session
+
+from app.dependencies.base import ReadSessionLocal
+from app.dependencies.static_files import CONTENT_NAMED
+from app.dependencies.uploads import UPLOAD_TEMP_PREFIX
+from app.dependencies.writer import run_write
+from app.models.images import delete_image_blobs, find_orphan_images
+from app.settings.base import settings
+
+
+"""
+回收static_files_root中沒有被引用的圖片
+
+以os.scandir逐批掃描目錄，每批最多image_gc_batch_size個檔名，以image_blobs的引用數判斷是否為孤兒
+只處理上傳流程產生的檔案(內容雜湊或uuid命名，以及中斷留下的暫存檔)，其他放在目錄中的檔案不會動到
+修改時間或引用數歸零的時間在image_gc_grace_seconds內的不刪除，
+避免刪掉剛上傳還沒寫入引用、或是剛被重新上傳而沿用的檔案
+刪除前先改名為GC_TRASH_PREFIX開頭的檔名再確認修改時間，見trash_image
+"""
+
+logger = logging.getLogger(__name__)
+
+GC_TRASH_PREFIX = ".gc-"
+
+def trash_image(filename: str, modified_before: float) -> bool:
+    """
+    刪除static_files_root中的檔案，刪除前被重新上傳時保留並回傳False
+
+    save_images沿用相同內容的檔案時只會os.utime原本的檔名，不經過資料庫也不加鎖，
+    直接stat再unlink的話，重新上傳可能剛好落在兩者之間，路由就會引用到已被刪除的檔案
+    先改名再stat：改名之前的os.utime會讓修改時間變新，這時改回原本的檔名；
+    改名之後原本的檔名已不存在，os.utime找不到檔案，save_images會改為寫入新的檔案
+    """
+    path = f"{settings.static_files_root}/{filename}"
+    trash = f"{settings.static_files_root}/{GC_TRASH_PREFIX}{filename}"
+    try:
+        os.replace(path, trash)
+        if os.stat(trash).st_mtime >= modified_before:
+            #內容相同，就算改名後又有人寫入新的檔案，覆蓋回去也沒有差別
+            os.replace(trash, path)
+            return False
+        os.unlink(trash)
+    except FileNotFoundError:
+        #其他worker的回收程序同時在處理同一個檔案
+        return False
+    return True
+
+def remove_orphan_images(db: Session, candidates: dict[str, int], released_before: datetime, modified_before: float) -> dict[str, int]:
+    """
+    在寫入的交易中重新確認並刪除，回傳{檔名: 大小}
+    """
+    removed = {}
+    for filename in find_orphan_images(db, list(candidates), released_before):
+        path = f"{settings.static_files_root}/{filename}"
+        try:
+            #掃描之後可能又被重新上傳
+            if os.stat(path).st_mtime >= modified_before:
+                continue
+        except FileNotFoundError:
+            continue
+        if trash_image(filename, modified_before):
+            removed[filename] = candidates[filename]
+    if removed:
+        delete_image_blobs(db, list(removed))
+    return removed
+
+def restore_trash(entry: os.DirEntry, modified_before: float, dry_run: bool):
+    """
+    trash_image在改名後中斷時留下的檔案，放回原本的檔名，下一次回收再依引用數判斷
+    改名會更新ctime，只處理ctime超過寬限時間的檔案，不會動到其他worker正在確認的檔案
+    """
+    if dry_run or entry.stat(follow_symlinks=False).st_ctime >= modified_before:
+        return
+    path = f"{settings.static_files_root}/{entry.name[len(GC_TRASH_PREFIX):]}"
+    try:
+        if os.path.exists(path):
+            os.unlink(entry.path)
+        else:
+            os.replace(entry.path, path)
+    except FileNotFoundError:
+        pass
+
+def collect_orphan_images(dry_run: bool = False, grace_seconds: float | None = None, batch_size: int | None = None) -> dict:
+    """
+    回傳回收報告，dry_run時只計算會被刪除的檔案
+    """
+    grace_seconds = settings.image_gc_grace_seconds if grace_seconds is None else grace_seconds
+    batch_size = batch_size or settings.image_gc_batch_size
+    start = time.perf_counter()
+    modified_before = time.time() - grace_seconds
+    released_before = datetime.now() - timedelta(seconds=grace_seconds)
+    report = {"dry_run": dry_run, "scanned": 0, "orphans": 0, "orphan_bytes": 0, "temp_files": 0, "temp_bytes": 0}
+
+    def flush(batch: dict[str, int]):
+        if not batch:
+            return
+        if dry_run:
+            with ReadSessionLocal() as db:
+                removed = {filename: batch[filename] for filename in find_orphan_images(db, list(batch), released_before)}
+        else:
+            removed = run_write(partial(remove_orphan_images, candidates=batch, released_before=released_before, modified_before=modified_before))
+        report["orphans"] += len(removed)
+        report["orphan_bytes"] += sum(removed.values())
+
+    batch = {}
+    with os.scandir(settings.static_files_root) as entries:
+        for entry in entries:
+            if entry.name.startswith(GC_TRASH_PREFIX):
+                restore_trash(entry, modified_before, dry_run)
+                continue
+            is_temp = entry.name.startswith(UPLOAD_TEMP_PREFIX)
+            if not (is_temp or CONTENT_NAMED.match(entry.name)) or not entry.is_file(follow_symlinks=False):
+                continue
+            report["scanned"] += 1
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime >= modified_before:
+                continue
+            if is_temp:
+                #上傳中斷留下的暫存檔
+                if not dry_run:
+                    try:
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        continue
+                report["temp_files"] += 1
+                report["temp_bytes"] += stat.st_size
+                continue
+            batch[entry.name] = stat.st_size
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = {}
+    flush(batch)
+    report["reclaimed_bytes"] = report["orphan_bytes"] + report["temp_bytes"]
+    report["elapsed_ms"] = (time.perf_counter() - start) * 1000
+    return report
+
+async def collect_orphan_images_periodically():
+    while True:
+        try:
+            report = await asyncio.to_thread(collect_orphan_images)
+            logger.info("圖片回收完成：刪除%d個孤兒、%d個暫存檔，共%d位元組", report["orphans"], report["temp_files"], report["reclaimed_bytes"])
+        except Exception:
+            logger.exception("圖片回收失敗")
+        await asyncio.sleep(settings.image_gc_interval_seconds)
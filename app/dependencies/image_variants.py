@@ -0,0 +1,245 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from app.enums.base import ImageVariantFormatEnum, ImageVariantPresetEnum
+from app.exceptions.base import ImageResizerBusyException
+from app.settings.base import settings
+
+
+"""
+圖片縮圖
+
+列表頁只需要小圖，卻得下載最大4MB的原圖，這裡依寬度預設與格式產生縮小並重新編碼過的版本
+縮放在獨立的行程池中執行，結果存在image_variant_root，
+以來源檔名(內容的SHA-256)、預設、格式與品質為鍵，總大小超過image_variant_max_bytes時淘汰最久沒用到的檔案
+"""
+
+VARIANT_WIDTHS = {
+    ImageVariantPresetEnum.THUMB: 160,
+    ImageVariantPresetEnum.SMALL: 320,
+    ImageVariantPresetEnum.MEDIUM: 640,
+    ImageVariantPresetEnum.LARGE: 1280,
+}
+VARIANT_MEDIA_TYPES = {
+    ImageVariantFormatEnum.WEBP: "image/webp",
+    ImageVariantFormatEnum.JPEG: "image/jpeg",
+}
+
+#在子行程中執行，必須是模組層級的函式
+def render_variant(source: str, destination: str, width: int, image_format: str, quality: int) -> int:
+    with Image.open(source) as image:
+        #JPEG可以在解碼時就先縮小，省下大部分的解碼時間，EXIF旋轉後寬高會對調，所以兩邊都至少保留width
+        image.draft("RGB", (width, width))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+        #WebP由Pillow自行轉換色彩模式
+        if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        directory = os.path.dirname(destination)
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=".variant-", suffix=".tmp", delete=False) as temp:
+            try:
+                image.save(temp, format=image_format.upper(), quality=quality, optimize=image_format == "jpeg")
+            except BaseException:
+                os.unlink(temp.name)
+                raise
+    os.replace(temp.name, destination)
+    return os.path.getsize(destination)
+
+
+class ImageVariantCache:
+    """
+    image_variant_root中縮圖的LRU索引
+
+    第一次使用時掃描目錄，依修改時間排序當作使用順序，命中時更新修改時間，重啟後也能沿用
+    每個行程各自維護索引，多個worker時總大小以各自看到的為準，可能短暫超過上限
+    """
+
+    def __init__(self, root: str, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, int] | None = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ensure_loaded(self):
+        if self.entries is not None:
+            return
+        with self.lock:
+            if self.entries is not None:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            files = []
+            for entry in os.scandir(self.root):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+            files.sort()
+            self.entries = OrderedDict((name, size) for _, name, size in files)
+            self.bytes = sum(self.entries.values())
+
+    def get(self, name: str) -> str | None:
+        self.ensure_loaded()
+        with self.lock:
+            if name not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(name)
+            self.hits += 1
+        path = f"{self.root}/{name}"
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            #被其他行程淘汰了
+            with self.lock:
+                self.bytes -= self.entries.pop(name, 0)
+            return None
+        return path
+
+    def put(self, name: str, size: int):
+        self.ensure_loaded()
+        evicted = []
+        with self.lock:
+            self.bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                old_name, old_size = self.entries.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.unlink(f"{self.root}/{old_name}")
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        self.ensure_loaded()
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class ImageResizer:
+    """
+    縮圖的行程池
+
+    和PasswordHasher一樣以max_pending限制同時進行的工作數，等不到名額時回報忙碌，
+    行程池未啟動時直接在呼叫的執行緒上縮放
+    同一個縮圖同時被多個請求要求時只縮放一次，其他請求等待同一個結果
+    """
+
+    def __init__(self, cache: ImageVariantCache, workers: int, max_pending: int, timeout_ms: int, quality: int) -> None:
+        self.cache = cache
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout_ms / 1000
+        self.quality = quality
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor: ProcessPoolExecutor | None = None
+        self.lock = threading.Lock()
+        self.inflight: dict[str, Future] = {}
+        self.rendered = 0
+        self.rejected = 0
+        self.total_time = 0.0
+
+    def is_running(self) -> bool:
+        return self.executor is not None
+
+    def start(self):
+        if self.is_running() or self.workers <= 0:
+            return
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if not self.is_running():
+            return
+        self.executor.shutdown(cancel_futures=True)
+        self.executor = None
+
+    def variant(self, filename: str, preset: ImageVariantPresetEnum, image_format: ImageVariantFormatEnum) -> str:
+        """
+        回傳縮圖的路徑，來源圖片無法解碼時拋出PIL的例外
+        """
+        stem = filename.rsplit(".", 1)[0]
+        name = f"{stem}.{preset.value}.q{self.quality}.{image_format.value}"
+        path = self.cache.get(name)
+        if path is not None:
+            return path
+        with self.lock:
+            future = self.inflight.get(name)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[name] = future
+        if not owner:
+            return future.result()
+        try:
+            size = self._render(f"{settings.static_files_root}/{filename}", f"{self.cache.root}/{name}", VARIANT_WIDTHS[preset], image_format.value)
+            self.cache.put(name, size)
+            future.set_result(f"{self.cache.root}/{name}")
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self.lock:
+                self.inflight.pop(name, None)
+        return future.result()
+
+    def _render(self, source: str, destination: str, width: int, image_format: str) -> int:
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.rejected += 1
+            raise ImageResizerBusyException()
+        start = time.perf_counter()
+        try:
+            self.cache.ensure_loaded()
+            executor = self.executor
+            if executor is None:
+                return render_variant(source, destination, width, image_format, self.quality)
+            return executor.submit(render_variant, source, destination, width, image_format, self.quality).result()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.rendered += 1
+                self.total_time += elapsed
+            self.slots.release()
+
+    def stats(self) -> dict:
+        with self.lock:
+            stats = {
+                "running": self.is_running(),
+                "workers": self.workers if self.is_running() else 0,
+                "rendering": len(self.inflight),
+                "rendered": self.rendered,
+                "rejected": self.rejected,
+                "avg_ms": self.total_time * 1000 / self.rendered if self.rendered else 0,
+            }
+        return {**stats, **self.cache.stats()}
+
+
+image_variant_cache = ImageVariantCache(root=settings.image_variant_root, max_bytes=settings.image_variant_max_bytes)
+
+image_resizer = ImageResizer(
+    cache=image_variant_cache,
+    workers=settings.image_variant_workers,
+    max_pending=settings.image_variant_max_pending,
+    timeout_ms=settings.image_variant_timeout_ms,
+    quality=settings.image_variant_quality
+)
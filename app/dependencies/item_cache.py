@@ -0,0 +1,131 @@
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Iterable
+
+from fastapi_pagination import resolve_params
+
+from app.schemas.general import ItemQuerySchema, PagingQuerySchema
+from app.settings.base import settings
+
+
+"""
+商品清單的回應快取
+
+以正規化後的查詢參數與分頁參數為key，快取已序列化的JSON回應
+每筆快取會標上頁面中商品與商店的tag，寫入路由在commit後只讓相關的快取失效
+新增/刪除商品或修改會影響篩選、排序的欄位時，清單成員與總數都可能改變，整批失效(LISTING_TAG)
+評論會改變熱門與評價排序，另外以排序方式為tag
+
+快取與失效都只在目前的行程內，多個worker時只有處理寫入的worker會讓快取失效，
+其他worker在ITEM_CACHE_TTL_SECONDS過期前仍可能回傳舊的清單，需要即時一致時請把TTL設為0
+"""
+
+LISTING_TAG = "listing"
+
+def item_tag(item_id: int) -> str:
+    return f"item:{item_id}"
+
+def store_tag(store_id: int) -> str:
+    return f"store:{store_id}"
+
+def order_tag(order_by) -> str:
+    return f"order:{order_by}"
+
+def listing_key(query: ItemQuerySchema, paging: PagingQuerySchema) -> tuple:
+    params = resolve_params()
+    return (tuple(sorted(query.model_dump().items())), paging.paging, paging.cursor, getattr(params, "page", None), params.size)
+
+
+class ItemListingCache:
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int) -> None:
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[tuple, tuple[bytes, frozenset[str], float]] = OrderedDict()
+        self.tags: dict[str, set[tuple]] = {}
+        self.bytes = 0
+        #每次失效都會遞增，查詢期間有失效發生時不寫入快取，避免存入過期的結果
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _remove(self, key: tuple):
+        body, tags, _ = self.entries.pop(key)
+        self.bytes -= len(body)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def get(self, key: tuple) -> bytes | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, body: bytes, tags: Iterable[str], generation: int):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self._remove(key)
+            tags = frozenset(tags) | {LISTING_TAG}
+            self.entries[key] = (body, tags, time.monotonic() + self.ttl)
+            self.bytes += len(body)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags: str):
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self.tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.invalidate(LISTING_TAG)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / (self.hits + self.misses) if self.hits + self.misses else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+item_listing_cache = ItemListingCache(
+    ttl_seconds=settings.item_cache_ttl_seconds,
+    max_entries=settings.item_cache_max_entries,
+    max_bytes=settings.item_cache_max_bytes
+)
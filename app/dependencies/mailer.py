@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import threading
+
+from email.utils import formataddr
+
+import aiosmtplib
+
+from fastapi_mail import ConnectionConfig, MessageSchema
+from fastapi_mail.msg import MailMsg
+
+from app.exceptions.base import MailQueueFullException
+from app.settings.base import settings
+from app.settings.mail import mail_conf
+
+
+logger = logging.getLogger(__name__)
+
+#連線中斷、逾時這類暫時性錯誤才重試，收件人被拒絕等錯誤重試也沒有用
+RETRYABLE_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError, ConnectionError, OSError)
+
+
+class MailWorker:
+    """
+    郵件寄送worker
+
+    在應用程式的event loop上執行，郵件排入有界佇列後依批次寄出，
+    SMTP連線在批次之間重複使用，閒置超過mail_idle_timeout_seconds才關閉
+    佇列滿時send最多等待mail_submit_timeout_ms，仍排不進去則拋出MailQueueFullException
+    python -m benchmarks.mail_worker以本機的aiosmtpd檢查連線重複使用、重試與關閉時寄完佇列
+    """
+
+    def __init__(self, config: ConnectionConfig, queue_size: int, batch_size: int, max_retries: int, retry_delay_ms: int, idle_timeout_seconds: float, submit_timeout_ms: int) -> None:
+        self.config = config
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay_ms / 1000
+        self.idle_timeout = idle_timeout_seconds
+        self.submit_timeout = submit_timeout_ms / 1000
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.queue: asyncio.Queue[tuple[MessageSchema, asyncio.Future] | None] | None = None
+        self.task: asyncio.Task | None = None
+        self.smtp: aiosmtplib.SMTP | None = None
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.connections = 0
+        self.batches = 0
+
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self):
+        if self.is_running():
+            return
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.task = self.loop.create_task(self._run())
+
+    async def stop(self, timeout: float = 10):
+        if not self.is_running():
+            return
+        #先寄完佇列中剩下的郵件，佇列已滿或SMTP伺服器無回應時最多等待timeout秒，之後取消worker
+        try:
+            async with asyncio.timeout(timeout):
+                await self.queue.put(None)
+                await asyncio.shield(self.task)
+        except TimeoutError:
+            logger.warning("關閉時仍有%d封郵件未寄出", self.queue.qsize())
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            #來不及寄出的郵件讓等待中的send拋出錯誤，不會永遠等下去
+            while not self.queue.empty():
+                entry = self.queue.get_nowait()
+                if entry is not None:
+                    self._abandon([entry])
+        await self._disconnect()
+        self.task = None
+
+    async def send(self, message: MessageSchema):
+        """
+        在event loop上呼叫，等到郵件寄出為止，重試後仍失敗時拋出最後的錯誤
+        佇列滿時最多等待mail_submit_timeout_ms，逾時則拋出MailQueueFullException
+        """
+        if not self.is_running():
+            await self._send_once(message)
+            return
+        future = self.loop.create_future()
+        try:
+            await asyncio.wait_for(self.queue.put((message, future)), self.submit_timeout)
+        except TimeoutError:
+            with self.lock:
+                self.rejected += 1
+            raise MailQueueFullException()
+        await future
+
+    async def _run(self):
+        while True:
+            try:
+                entry = await asyncio.wait_for(self.queue.get(), timeout=self.idle_timeout)
+            except TimeoutError:
+                await self._disconnect()
+                continue
+            stopping = entry is None
+            batch = [] if stopping else [entry]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                entry = self.queue.get_nowait()
+                if entry is None:
+                    stopping = True
+                else:
+                    batch.append(entry)
+            if batch:
+                await self._send_batch(batch)
+            if stopping and self.queue.empty():
+                await self._disconnect()
+                return
+
+    async def _send_batch(self, batch: list[tuple[MessageSchema, asyncio.Future]]):
+        with self.lock:
+            self.batches += 1
+        try:
+            for message, future in batch:
+                error = await self._send_with_retry(message)
+                if not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+        finally:
+            #worker在寄送途中被取消時
+            self._abandon(batch)
+
+    def _abandon(self, batch: list[tuple[MessageSchema, asyncio.Future]]):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("郵件worker已停止，郵件未寄出"))
+
+    async def _send_with_retry(self, message: MessageSchema) -> Exception | None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._send(message)
+                with self.lock:
+                    self.sent += 1
+                return None
+            except RETRYABLE_ERRORS as exc:
+                await self._disconnect()
+                if attempt == self.max_retries:
+                    error = exc
+                    break
+                with self.lock:
+                    self.retried += 1
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            except Exception as exc:
+                error = exc
+                break
+        logger.warning("寄送郵件失敗：%s", error)
+        with self.lock:
+            self.failed += 1
+        return error
+
+    async def _send(self, message: MessageSchema):
+        if self.config.SUPPRESS_SEND:
+            return
+        if self.smtp is None or not self.smtp.is_connected:
+            self.smtp = await self._connect()
+        await self.smtp.send_message(await self._build(message))
+
+    async def _send_once(self, message: MessageSchema):
+        if self.config.SUPPRESS_SEND:
+            return
+        smtp = await self._connect()
+        try:
+            await smtp.send_message(await self._build(message))
+        finally:
+            smtp.close()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            timeout=self.config.TIMEOUT,
+            port=self.config.MAIL_PORT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+            local_hostname=self.config.LOCAL_HOSTNAME,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD.get_secret_value())
+        with self.lock:
+            self.connections += 1
+        return smtp
+
+    async def _disconnect(self):
+        if self.smtp is None:
+            return
+        smtp, self.smtp = self.smtp, None
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def _build(self, message: MessageSchema):
+        sender = message.from_email or self.config.MAIL_FROM
+        from_name = message.from_name or self.config.MAIL_FROM_NAME
+        return await MailMsg(message)._message(formataddr((from_name, sender)) if from_name is not None else sender)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "running": self.is_running(),
+                "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+                "queue_size": self.queue_size,
+                "batches": self.batches,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+                "rejected": self.rejected,
+                "connections": self.connections,
+            }
+
+
+mail_worker = MailWorker(
+    config=mail_conf,
+    queue_size=settings.mail_queue_size,
+    batch_size=settings.mail_batch_size,
+    max_retries=settings.mail_max_retries,
+    retry_delay_ms=settings.mail_retry_delay_ms,
+    idle_timeout_seconds=settings.mail_idle_timeout_seconds,
+    submit_timeout_ms=settings.mail_submit_timeout_ms
+)
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+
+from functools import partial
+
+from app.dependencies.mailer import mail_worker
+from app.dependencies.writer import run_write
+from app.models.outbox import claim_emails, mark_emails, purge_emails, to_message
+from app.settings.base import settings
+
+
+logger = logging.getLogger(__name__)
+
+#清除過期紀錄的間隔，不需要每次輪詢都做
+PURGE_INTERVAL_SECONDS = 3600
+
+class OutboxDrainer:
+    """
+    email_outbox的drainer
+
+    每次認領最多email_outbox_batch_size封郵件交給mail_worker寄送，再一次寫回結果
+    寄件匣清空時等待email_outbox_poll_seconds，或是等路由寫入新郵件後呼叫notify提早喚醒
+    閒置時每PURGE_INTERVAL_SECONDS刪除一次超過email_outbox_retention_hours的SENT與FAILED紀錄
+    """
+
+    def __init__(self) -> None:
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.wakeup: asyncio.Event | None = None
+        self.purged_at: float | None = None
+
+    def notify(self):
+        #路由在執行緒池中呼叫
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def drain(self) -> int:
+        rows = await asyncio.to_thread(run_write, partial(claim_emails, limit=settings.email_outbox_batch_size, lease_seconds=settings.email_outbox_lease_seconds))
+        if not rows:
+            return 0
+        errors = await asyncio.gather(*(mail_worker.send(to_message(row)) for row in rows), return_exceptions=True)
+        results = {row.id: (row.attempts, error) for row, error in zip(rows, errors)}
+        await asyncio.to_thread(run_write, partial(mark_emails, results=results, max_attempts=settings.email_outbox_max_attempts, backoff_seconds=settings.email_outbox_backoff_seconds))
+        return len(rows)
+
+    async def purge(self) -> int:
+        self.purged_at = time.monotonic()
+        return await asyncio.to_thread(run_write, partial(purge_emails, retention_hours=settings.email_outbox_retention_hours))
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        while True:
+            self.wakeup.clear()
+            try:
+                if await self.drain():
+                    continue
+                if self.purged_at is None or time.monotonic() - self.purged_at > PURGE_INTERVAL_SECONDS:
+                    await self.purge()
+            except Exception:
+                logger.exception("寄件匣寄送失敗")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=settings.email_outbox_poll_seconds)
+            except TimeoutError:
+                pass
+
+
+outbox_drainer = OutboxDrainer()
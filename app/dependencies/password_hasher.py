@@ -0,0 +1,129 @@
+import multiprocessing
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from passlib.context import CryptContext
+
+from app.exceptions.base import PasswordHasherBusyException
+from app.settings.base import settings
+
+
+@lru_cache
+def crypt_context(rounds: int) -> CryptContext:
+    #min/max都設為同一個成本，成本設定改變後舊的雜湊會被視為需要更新
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+
+#以下兩個函式會在子行程中執行，必須是模組層級的函式
+def hash_password(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+def verify_and_update_password(password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    return crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    bcrypt雜湊與驗證的行程池
+
+    bcrypt每次都要耗費數十毫秒的CPU，放在請求的執行緒上做會在登入尖峰時拖慢所有請求
+    改由獨立的行程池執行，同時進行的工作數以max_pending限制，
+    超過password_hash_timeout_ms仍等不到名額時回報忙碌
+    行程池未啟動時(例如指令稿、測試)直接在呼叫的執行緒上計算，但一樣受max_pending限制
+
+    行程池預設不啟動(password_hash_workers=0)，每次都要把工作送到子行程，多核心時登入吞吐量比直接計算低，
+    只在少核心、登入尖峰會讓其他請求排不到CPU時才值得開啟，可以用python -m benchmarks.login_throughput比較
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout_ms: int, rounds: int) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout_ms / 1000
+        self.rounds = rounds
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.executor: ProcessPoolExecutor | None = None
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rehashed = 0
+        self.rejected = 0
+        self.total_time = 0.0
+
+    def is_running(self) -> bool:
+        return self.executor is not None
+
+    def start(self):
+        if self.is_running() or self.workers <= 0:
+            return
+        #以spawn啟動，避免在已有多條執行緒的行程中fork
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if not self.is_running():
+            return
+        self.executor.shutdown(cancel_futures=True)
+        self.executor = None
+
+    def _run(self, fn, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.rejected += 1
+            raise PasswordHasherBusyException()
+        with self.lock:
+            self.pending += 1
+        start = time.perf_counter()
+        try:
+            executor = self.executor
+            if executor is None:
+                return fn(*args)
+            return executor.submit(fn, *args).result()
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.pending -= 1
+                self.total_time += elapsed
+            self.slots.release()
+
+    def hash(self, password: str) -> str:
+        hashed_password = self._run(hash_password, password, self.rounds)
+        with self.lock:
+            self.hashed += 1
+        return hashed_password
+
+    def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """
+        回傳(是否正確, 新的雜湊)，成本設定改變時才會有新的雜湊
+        """
+        valid, new_hash = self._run(verify_and_update_password, password, hashed_password, self.rounds)
+        with self.lock:
+            self.verified += 1
+            if new_hash is not None:
+                self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        with self.lock:
+            calls = self.hashed + self.verified
+            return {
+                "running": self.is_running(),
+                "workers": self.workers if self.is_running() else 0,
+                "rounds": self.rounds,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "hashed": self.hashed,
+                "verified": self.verified,
+                "rehashed": self.rehashed,
+                "rejected": self.rejected,
+                "avg_ms": self.total_time * 1000 / calls if calls else 0,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    timeout_ms=settings.password_hash_timeout_ms,
+    rounds=settings.bcrypt_rounds
+)
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies.writer import run_write
+from app.models.models import ItemPopularity
+from app.models.popularity import refresh_item_popularity, weighted_sample
+from app.settings.base import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityPool:
+    """
+    行程內的熱門度快取
+
+    item_popularities每popularity_refresh_seconds才重算一次，不必每個請求都讀出整張表，
+    和AdPool一樣在第一次使用時載入(item_id, score)，之後每次抽樣都不用查資料庫
+    本行程重算後立即重新載入，其他worker則在popularity_refresh_seconds後自行重新載入
+    """
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self.ttl = ttl_seconds
+        self.population: list[tuple[int, float]] = []
+        self.loaded_at: float | None = None
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    async def sample(self, db: AsyncSession, k: int) -> list[int]:
+        if self.is_stale():
+            #同時有多個請求發現過期時可能各自載入一次，結果相同，不另外加鎖
+            rows = (await db.execute(select(ItemPopularity.item_id, ItemPopularity.score))).all()
+            self.population = [(item_id, score) for item_id, score in rows]
+            self.loaded_at = time.monotonic()
+        return weighted_sample(population=self.population, k=k)
+
+
+popularity_pool = PopularityPool(ttl_seconds=settings.popularity_refresh_seconds)
+
+async def refresh_popularity_periodically():
+    while True:
+        try:
+            await asyncio.to_thread(run_write, refresh_item_popularity)
+            popularity_pool.invalidate()
+        except Exception:
+            logger.exception("商品熱門度更新失敗")
+        await asyncio.sleep(settings.popularity_refresh_seconds)
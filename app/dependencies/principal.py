@@ -0,0 +1,102 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.models.models import User
+from app.settings.base import settings
+
+
+class PrincipalCache:
+    """
+    已登入使用者的快取，以access token的sub(使用者名稱)為key
+
+    快取的是脫離session的User快照，命中時以merge(load=False)放進本次請求的session，
+    不會查詢users資料表，store等關聯仍照常延遲載入
+    使用者資料被修改或刪除時立即失效，其他worker則最多延遲principal_cache_ttl_seconds
+    最多保留max_entries位使用者，超過時淘汰最久沒有使用的
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, revoke_seconds: float) -> None:
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.revoke_seconds = revoke_seconds
+        self.lock = threading.Lock()
+        self.users: OrderedDict[str, tuple[User, float]] = OrderedDict()
+        #在本行程中被刪除的使用者id與到期時間，只看token內容的快速路徑用來拒絕尚未過期的token
+        #token最多有效revoke_seconds，之後就不必再記住
+        self.deleted_ids: dict[int, float] = {}
+        self.generation = 0
+
+    def lookup(self, username: str) -> User | None:
+        if self.ttl <= 0:
+            return None
+        with self.lock:
+            entry = self.users.get(username)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self.users[username]
+                return None
+            self.users.move_to_end(username)
+            return entry[0]
+
+    def get(self, db: Session, username: str) -> User | None:
+        cached = self.lookup(username)
+        if cached is not None:
+            return db.merge(cached, load=False)
+        generation = self.generation
+        user = db.query(User).filter(User.username == username).first()
+        if user is not None and self.ttl > 0:
+            snapshot = User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+            make_transient_to_detached(snapshot)
+            with self.lock:
+                if generation == self.generation:
+                    self.users[username] = (snapshot, time.monotonic() + self.ttl)
+                    self.users.move_to_end(username)
+                    while len(self.users) > self.max_entries:
+                        self.users.popitem(last=False)
+        return user
+
+    def claims(self, session_factory, username: str) -> tuple[int, bool] | None:
+        """
+        給只看token內容的路徑使用，回傳目前的(使用者id, is_admin)，使用者已被刪除或改名時回傳None
+        快取命中時不查詢資料庫，否則以session_factory開一個短暫的session查詢並放進快取
+        """
+        cached = self.lookup(username)
+        if cached is not None:
+            return cached.id, cached.is_admin
+        with session_factory() as db:
+            user = self.get(db, username)
+            return (user.id, user.is_admin) if user is not None else None
+
+    def invalidate(self, *usernames: str):
+        with self.lock:
+            self.generation += 1
+            for username in usernames:
+                self.users.pop(username, None)
+
+    def revoke(self, user_id: int, username: str):
+        now = time.monotonic()
+        with self.lock:
+            self.deleted_ids = {deleted: expire_at for deleted, expire_at in self.deleted_ids.items() if expire_at > now}
+            self.deleted_ids[user_id] = now + self.revoke_seconds
+        self.invalidate(username)
+
+    def is_revoked(self, user_id: int) -> bool:
+        with self.lock:
+            expire_at = self.deleted_ids.get(user_id)
+            if expire_at is not None and expire_at <= time.monotonic():
+                del self.deleted_ids[user_id]
+                return False
+            return expire_at is not None
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+    max_entries=settings.principal_cache_max_entries,
+    revoke_seconds=settings.access_token_expire_minutes * 60,
+)
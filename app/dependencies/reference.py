@@ -0,0 +1,75 @@
+import hashlib
+import threading
+import time
+
+from fastapi import Request, Response
+
+from pydantic import TypeAdapter
+
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.dependencies.conditional import is_not_modified, not_modified_response
+from app.models.models import City, District
+from app.schemas.general import FullCitySchema, FullDistrictSchema
+from app.settings.base import settings
+
+
+class CachedBody:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+    def response(self, request: Request) -> Response:
+        if is_not_modified(request, self.etag):
+            return not_modified_response(self.etag)
+        return Response(content=self.body, media_type="application/json", headers={"ETag": self.etag})
+
+
+class ReferenceCache:
+    """
+    縣市與區域的參考資料快取
+
+    整棵縣市/區域樹先序列化成JSON bytes並附上strong ETag，
+    GET時不需要查資料庫也不需要經過pydantic
+    管理員修改後會立即重新載入，其他worker則在reference_cache_ttl_seconds後自行重新載入
+    """
+
+    def __init__(self, ttl_seconds: int) -> None:
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        self.cities: CachedBody | None = None
+        self.city_bodies: dict[int, CachedBody] = {}
+        self.districts: CachedBody | None = None
+        self.district_bodies: dict[int, CachedBody] = {}
+        self.district_ids: frozenset[int] = frozenset()
+        self.loaded_at: float | None = None
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl
+
+    def _load(self, db: Session):
+        cities = TypeAdapter(list[FullCitySchema]).validate_python(db.query(City).options(selectinload(City.districts)).order_by(City.id).all(), from_attributes=True)
+        districts = TypeAdapter(list[FullDistrictSchema]).validate_python(db.query(District).options(joinedload(District.city)).order_by(District.id).all(), from_attributes=True)
+        self.cities = CachedBody(TypeAdapter(list[FullCitySchema]).dump_json(cities))
+        self.city_bodies = {city.id: CachedBody(city.model_dump_json().encode()) for city in cities}
+        self.districts = CachedBody(TypeAdapter(list[FullDistrictSchema]).dump_json(districts))
+        self.district_bodies = {district.id: CachedBody(district.model_dump_json().encode()) for district in districts}
+        self.district_ids = frozenset(self.district_bodies)
+        self.loaded_at = time.monotonic()
+
+    def load(self, db: Session):
+        with self.lock:
+            self._load(db)
+
+    def ensure_loaded(self, db: Session):
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self._load(db)
+
+    def has_district(self, db: Session, district_id: int) -> bool:
+        self.ensure_loaded(db)
+        return district_id in self.district_ids
+
+
+reference_cache = ReferenceCache(ttl_seconds=settings.reference_cache_ttl_seconds)
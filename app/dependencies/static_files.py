@@ -0,0 +1,146 @@
+import mimetypes
+import os
+import re
+
+import anyio
+
+from fastapi.staticfiles import StaticFiles
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+
+"""
+靜態檔案
+
+上傳的檔案以內容的SHA-256(舊檔案為uuid)命名，內容永遠不會改變，回傳一年的immutable快取，瀏覽器不必再重新驗證
+有預先壓縮好的.br或.gz檔案且瀏覽器接受時改傳壓縮版本
+支援單一範圍的Range請求，伺服器提供http.response.zerocopysend擴充時以sendfile傳送，否則以較大的區塊讀檔傳送
+"""
+
+#sha256.ext或uuid.ext
+CONTENT_NAMED = re.compile(r"^(?:[0-9a-f]{64}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.[0-9a-z]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+#依偏好順序
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+#圖片本身已經壓縮過，只有這些類型才去找壓縮版本
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    回傳(起點, 終點)，終點包含在內，不支援或格式錯誤時回傳None表示傳送整個檔案
+    範圍超出檔案時拋出ValueError
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.group(1), match.group(2)
+    if first == "":
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError()
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError()
+    if end < start:
+        return None
+    return start, end
+
+
+class StaticFileResponse(FileResponse):
+    chunk_size = 256 * 1024
+
+    def __init__(self, *args, byte_range: tuple[int, int] | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.byte_range = byte_range
+        self.headers["accept-ranges"] = "bytes"
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{self.stat_result.st_size}"
+            self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD" or (self.byte_range is None and "http.response.pathsend" in extensions):
+            await super().__call__(scope, receive, send)
+            return
+        start, end = self.byte_range if self.byte_range is not None else (0, self.stat_result.st_size - 1)
+        count = end - start + 1
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": start, "count": count, "more_body": False})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(start)
+                if count <= 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+                while count > 0:
+                    chunk = await file.read(min(self.chunk_size, count))
+                    #檔案在傳送中被截短時直接結束
+                    count = count - len(chunk) if chunk else 0
+                    await send({"type": "http.response.body", "body": chunk, "more_body": count > 0})
+        if self.background is not None:
+            await self.background()
+
+
+class ContentStaticFiles(StaticFiles):
+    """
+    取代StaticFiles，加上immutable快取、預先壓縮的檔案與Range請求
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        #不提供隱藏檔，例如上傳中的暫存檔
+        if any(part.startswith(".") for part in path.replace("\\", "/").split("/") if part):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        headers = {}
+        if CONTENT_NAMED.match(name):
+            headers["cache-control"] = IMMUTABLE
+        media_type = mimetypes.guess_type(name)[0] or "text/plain"
+        compressible = media_type.startswith(COMPRESSIBLE_TYPES)
+        encoded_path, encoded_stat, encoding = full_path, stat_result, None
+        range_header = request_headers.get("range")
+        #壓縮版本的位元組和原檔不同，Range請求一律傳原檔
+        if compressible and range_header is None:
+            accepted = {coding.split(";")[0].strip() for coding in request_headers.get("accept-encoding", "").split(",")}
+            for coding, suffix in PRECOMPRESSED:
+                if coding not in accepted:
+                    continue
+                try:
+                    encoded_stat = os.stat(f"{full_path}{suffix}")
+                except (FileNotFoundError, NotADirectoryError):
+                    continue
+                encoded_path, encoding = f"{full_path}{suffix}", coding
+                break
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+        if compressible:
+            headers["vary"] = "Accept-Encoding"
+
+        response = StaticFileResponse(encoded_path, status_code=status_code, headers=headers, media_type=media_type, stat_result=encoded_stat)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if range_header is None or status_code != 200:
+            return response
+        if_range = request_headers.get("if-range")
+        if if_range is not None and if_range not in (response.headers["etag"], response.headers["last-modified"]):
+            return response
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={"content-range": f"bytes */{stat_result.st_size}", "accept-ranges": "bytes"})
+        if byte_range is None:
+            return response
+        return StaticFileResponse(full_path, headers=headers, media_type=media_type, stat_result=stat_result, byte_range=byte_range)
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+
+from app.exceptions.base import ImageTooLargeException, UnsupportedImageException
+from app.settings.base import settings
+
+
+"""
+圖片上傳
+
+UploadLimitMiddleware在Starlette解析multipart之前檢查請求大小，
+Content-Length超過上限時直接拒絕，沒有Content-Length時邊接收邊計算位元組數，超過就中止
+只收一張圖片的路由(SINGLE_IMAGE_PATHS)上限為單檔上限加上multipart的欄位開銷，其他路由為整個請求的上限
+save_images以固定大小的區塊把上傳檔案複製到static_files_root下的暫存檔，
+同時依檔頭判斷圖片格式、計算大小與SHA-256，全部通過後才以os.replace換成正式檔名，
+失敗時刪除暫存檔，不會留下寫到一半的圖片
+檔名為內容的SHA-256，已經有相同內容的檔案時直接沿用，引用數見app.models.images
+"""
+
+IMAGE_SIGNATURES = {
+    "jpeg": (b"\xff\xd8\xff",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "gif": (b"GIF87a", b"GIF89a"),
+}
+IMAGE_EXTENSIONS = {"jpeg": ".jpg", "png": ".png", "gif": ".gif"}
+IMAGE_FORMATS = ("jpeg", "png")
+UPLOAD_TEMP_PREFIX = ".upload-"
+#只收一張圖片的路由
+SINGLE_IMAGE_PATHS = (
+    r"/user/icon",
+    r"/user/store/icon",
+    r"/user/store/items/\d+/icon",
+    r"/admin/ads/\d+/icon",
+)
+#判斷格式需要的檔頭長度
+SNIFF_BYTES = max(len(signature) for signatures in IMAGE_SIGNATURES.values() for signature in signatures)
+
+
+def sniff_image(head: bytes) -> str | None:
+    for image_format, signatures in IMAGE_SIGNATURES.items():
+        if head.startswith(signatures):
+            return image_format
+    return None
+
+def stage_image(upload: UploadFile, formats: tuple[str, ...], max_bytes: int, chunk_bytes: int) -> tuple[str, str]:
+    """
+    回傳(暫存檔路徑, 檔名)
+    """
+    upload.file.seek(0)
+    temp = tempfile.NamedTemporaryFile(dir=settings.static_files_root, prefix=UPLOAD_TEMP_PREFIX, suffix=".tmp", delete=False)
+    try:
+        with temp:
+            digest = hashlib.sha256()
+            head = b""
+            image_format = None
+            size = 0
+            while chunk := upload.file.read(chunk_bytes):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageTooLargeException(max_bytes)
+                if image_format is None:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                    if len(head) >= SNIFF_BYTES:
+                        image_format = sniff_image(head)
+                        if image_format not in formats:
+                            raise UnsupportedImageException(formats)
+                digest.update(chunk)
+                temp.write(chunk)
+            if image_format is None:
+                #檔案比SNIFF_BYTES還短
+                image_format = sniff_image(head)
+                if image_format not in formats:
+                    raise UnsupportedImageException(formats)
+    except BaseException:
+        os.unlink(temp.name)
+        raise
+    return temp.name, digest.hexdigest() + IMAGE_EXTENSIONS[image_format]
+
+def save_images(uploads: list[UploadFile], formats: tuple[str, ...] = IMAGE_FORMATS) -> list[str]:
+    """
+    回傳存到static_files_root下的檔名，任一張不符合時拋出UnsupportedImageException或ImageTooLargeException，且一張都不會存
+    """
+    staged = []
+    try:
+        for upload in uploads:
+            staged.append(stage_image(upload, formats, settings.upload_max_file_bytes, settings.upload_chunk_bytes))
+    except BaseException:
+        for path, _ in staged:
+            os.unlink(path)
+        raise
+    for path, filename in staged:
+        destination = f"{settings.static_files_root}/{filename}"
+        try:
+            #已有相同內容的檔案，更新修改時間，避免回收程序把剛被重新上傳、尚未寫入引用的檔案刪掉
+            #回收程序刪除前會先改名(見image_gc.trash_image)，檔案正在被回收時這裡會找不到檔案，改為寫入新的檔案
+            os.utime(destination)
+            os.unlink(path)
+        except FileNotFoundError:
+            os.replace(path, destination)
+    return [filename for _, filename in staged]
+
+def save_image(upload: UploadFile, formats: tuple[str, ...] = IMAGE_FORMATS) -> str:
+    return save_images([upload], formats)[0]
+
+
+class RequestTooLargeException(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """
+    限制multipart請求的大小，在Starlette把請求內容寫入暫存檔之前就拒絕過大的上傳
+    path_limits為{路徑的正規表示式: 上限}，路徑完全符合時改用該上限，都不符合時為max_bytes
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: dict[str, int] | None = None) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = [(re.compile(pattern), limit) for pattern, limit in (path_limits or {}).items()]
+
+    def limit_for(self, path: str) -> int:
+        for pattern, limit in self.path_limits:
+            if pattern.fullmatch(path):
+                return limit
+        return self.max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self.limit_for(scope["path"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self.reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    too_large = True
+                    raise RequestTooLargeException()
+            return message
+
+        async def guarded_send(message):
+            #中止後應用程式回傳的解析錯誤不送出，改回413
+            if not too_large:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large:
+            await self.reject(scope, receive, send, max_bytes)
+
+    async def reject(self, scope, receive, send, max_bytes: int):
+        response = JSONResponse(content={"message": f"上傳內容請勿超過{max_bytes // (1024 * 1024)}MB"}, status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
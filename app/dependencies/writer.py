@@ -0,0 +1,197 @@
+import asyncio
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+
+from fastapi import Depends
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.dependencies.base import SessionLocal, get_db, get_async_db
+from app.exceptions.base import WriteQueueFullException
+from app.settings.base import settings
+
+
+T = TypeVar("T")
+
+
+class WriteSerializer:
+    """
+    單一寫入執行緒
+
+    所有寫入工作排入有界佇列，由同一條執行緒依序執行，
+    並將多個小交易合併成一次commit(一次fsync)
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, batch_wait_ms: int, submit_timeout_ms: int) -> None:
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.submit_timeout = submit_timeout_ms / 1000
+        self.queue: queue.Queue[tuple[Callable[[Session], object], Future, float] | None] = queue.Queue(maxsize=queue_size)
+        self.thread: threading.Thread | None = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.transactions = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_batch_size = 0
+        self.total_wait = 0.0
+        self.total_commit = 0.0
+        self.last_commit = 0.0
+        self.max_commit = 0.0
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self.thread = threading.Thread(target=self._run, name="write-serializer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if not self.is_running():
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def submit_future(self, work: Callable[[Session], T]) -> Future:
+        future = Future()
+        try:
+            self.queue.put((work, future, time.perf_counter()), timeout=self.submit_timeout)
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            raise WriteQueueFullException()
+        return future
+
+    def submit(self, work: Callable[[Session], T]) -> T:
+        return self.submit_future(work).result()
+
+    async def submit_async(self, work: Callable[[Session], T]) -> T:
+        return await asyncio.wrap_future(self.submit_future(work))
+
+    def _next_batch(self):
+        job = self.queue.get()
+        if job is None:
+            return None
+        batch = [job]
+        deadline = time.perf_counter() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self.queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            started = time.perf_counter()
+            results = self._execute(batch)
+            finished = time.perf_counter()
+            with self.lock:
+                self.batches += 1
+                self.transactions += len(batch)
+                self.failed += sum(1 for result in results if isinstance(result, BaseException))
+                self.last_batch_size = len(batch)
+                self.total_wait += sum(started - enqueued for _, _, enqueued in batch)
+                self.last_commit = finished - started
+                self.total_commit += self.last_commit
+                self.max_commit = max(self.max_commit, self.last_commit)
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _execute(self, batch) -> list:
+        db = SessionLocal()
+        try:
+            try:
+                results = [work(db) for work, _, _ in batch]
+                db.commit()
+                return results
+            except Exception:
+                db.rollback()
+            # 批次中有工作失敗時，逐一重新執行，只讓失敗的工作回報錯誤
+            results = []
+            for work, _, _ in batch:
+                try:
+                    result = work(db)
+                    db.commit()
+                    results.append(result)
+                except Exception as exc:
+                    db.rollback()
+                    results.append(exc)
+            return results
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "enabled": settings.write_serializer_enabled,
+                "running": self.is_running(),
+                "queue_depth": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "batches": self.batches,
+                "transactions": self.transactions,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "last_batch_size": self.last_batch_size,
+                "avg_batch_size": self.transactions / self.batches if self.batches else 0,
+                "avg_wait_ms": self.total_wait * 1000 / self.transactions if self.transactions else 0,
+                "last_commit_ms": self.last_commit * 1000,
+                "avg_commit_ms": self.total_commit * 1000 / self.batches if self.batches else 0,
+                "max_commit_ms": self.max_commit * 1000,
+            }
+
+
+write_serializer = WriteSerializer(
+    queue_size=settings.write_queue_size,
+    batch_size=settings.write_batch_size,
+    batch_wait_ms=settings.write_batch_wait_ms,
+    submit_timeout_ms=settings.write_submit_timeout_ms
+)
+
+def run_write(work: Callable[[Session], T]) -> T:
+    if write_serializer.is_running():
+        return write_serializer.submit(work)
+    db = SessionLocal()
+    try:
+        result = work(db)
+        db.commit()
+        return result
+    finally:
+        db.close()
+
+def get_writer(db: Session = Depends(get_db)):
+    def write(work: Callable[[Session], T]) -> T:
+        if write_serializer.is_running():
+            return write_serializer.submit(work)
+        result = work(db)
+        db.commit()
+        return result
+    return write
+
+def get_async_writer(db: AsyncSession = Depends(get_async_db)):
+    async def write(work: Callable[[Session], T]) -> T:
+        if write_serializer.is_running():
+            return await write_serializer.submit_async(work)
+        result = await db.run_sync(work)
+        await db.commit()
+        return result
+    return write
@@ -30,4 +30,38 @@ class ItemQueryOrderByEnum(Enum):
     STORE_ID = "store_id"
     HOTTEST = "hottest"
     BEST = "best"
-    PRICE = "price"
\ No newline at end of file
+    PRICE = "price"
+
+
+class PagingModeEnum(Enum):
+    OFFSET = "offset"
+    CURSOR = "cursor"
+
+
+class ItemSearchModeEnum(Enum):
+    LIKE = "like"
+    FULLTEXT = "fulltext"
+
+
+class EmailOutboxStatus(Enum):
+    PENDING = 1
+    SENDING = 2
+    SENT = 3
+    FAILED = 4
+
+
+class ImageVariantPresetEnum(Enum):
+    THUMB = "thumb"
+    SMALL = "small"
+    MEDIUM = "medium"
+    LARGE = "large"
+
+
+class ImageVariantFormatEnum(Enum):
+    WEBP = "webp"
+    JPEG = "jpeg"
+
+
+class ItemBulkFormatEnum(Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
\ No newline at end of file
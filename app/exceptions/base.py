@@ -18,4 +18,47 @@ class ModelNotFoundException(Exception):
 
 class PermissionException(Exception):
     def __init__(self, *args: object) -> None:
-        super().__init__(*args)
\ No newline at end of file
+        super().__init__(*args)
+
+
+class WriteQueueFullException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class InvalidCursorException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class PasswordHasherBusyException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class MailQueueFullException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class UnsupportedImageException(Exception):
+    def __init__(self, formats: tuple[str, ...], *args: object) -> None:
+        super().__init__(*args)
+        self.formats = formats
+
+
+class ImageTooLargeException(Exception):
+    def __init__(self, max_bytes: int, *args: object) -> None:
+        super().__init__(*args)
+        self.max_bytes = max_bytes
+
+
+class ImageResizerBusyException(Exception):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+
+
+class OutOfStockException(Exception):
+    def __init__(self, item_id: int, *args: object) -> None:
+        super().__init__(*args)
+        self.item_id = item_id
\ No newline at end of file
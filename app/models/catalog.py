@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+
+from datetime import datetime
+from typing import IO, Iterator
+
+from pydantic import ValidationError
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from ..enums.base import ItemBulkFormatEnum
+from ..schemas.user import CUItemSchema
+from .models import Item
+
+
+"""
+商店商品的批次匯入與匯出
+
+匯入檔每一列是一個商品，有id時更新該商品，沒有id時新增
+每item_import_batch_size列為一批，以executemany一次寫入並提交，
+格式錯誤或不屬於這個商店的列會被略過並回報列號，其他列照常寫入
+匯出以yield_per分批讀取，邊讀邊輸出，記憶體用量與商品數量無關
+"""
+
+CATALOG_COLUMNS = ["id", "name", "introduction", "count", "price", "need_18"]
+
+
+def read_catalog(file: IO[bytes], file_format: ItemBulkFormatEnum) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    逐列產生(列號, 資料, 錯誤訊息)
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if file_format == ItemBulkFormatEnum.CSV:
+            reader = csv.DictReader(text)
+            missing = [column for column in CATALOG_COLUMNS[1:] if column not in (reader.fieldnames or [])]
+            if missing:
+                yield 1, None, f"缺少欄位：{', '.join(missing)}"
+                return
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if key is not None}, None
+        else:
+            for line_num, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield line_num, None, "JSON格式錯誤"
+                    continue
+                if not isinstance(row, dict):
+                    yield line_num, None, "每一列必須是JSON物件"
+                    continue
+                yield line_num, row, None
+    except UnicodeDecodeError:
+        yield 0, None, "檔案必須是UTF-8編碼"
+    finally:
+        text.detach()
+
+def parse_catalog_row(row: dict) -> tuple[int | None, dict]:
+    item_id = row.get("id")
+    if item_id in (None, ""):
+        item_id = None
+    else:
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            raise ValueError("id必須是整數")
+    try:
+        data = CUItemSchema.model_validate({column: row.get(column) for column in CATALOG_COLUMNS[1:]})
+    except ValidationError as exc:
+        raise ValueError("；".join(f"{'.'.join(str(loc) for loc in error['loc'])}：{error['msg']}" for error in exc.errors()))
+    return item_id, data.model_dump()
+
+def upsert_catalog(db: Session, store_id: int, rows: list[tuple[int, int | None, dict]]) -> tuple[int, int, list[tuple[int, str]]]:
+    """
+    rows為[(列號, 商品id, 資料)]，回傳(新增數, 更新數, [(列號, 錯誤訊息)])
+    count直接設定為可賣出的庫存，不含未出貨訂單已預留的數量(見app.models.inventory)
+    """
+    now = datetime.now()
+    ids = {item_id for _, item_id, _ in rows if item_id is not None}
+    owned = set(db.scalars(select(Item.id).where(Item.store_id == store_id, Item.id.in_(ids)))) if ids else set()
+    inserts, updates, errors = [], [], []
+    for line_num, item_id, data in rows:
+        if item_id is None:
+            inserts.append({**data, "store_id": store_id, "created_at": now, "updated_at": now})
+        elif item_id in owned:
+            updates.append({**data, "id": item_id, "updated_at": now})
+        else:
+            errors.append((line_num, "商品不存在或無權存取"))
+    if inserts:
+        db.execute(insert(Item), inserts)
+    if updates:
+        db.execute(update(Item), updates)
+    return len(inserts), len(updates), errors
+
+def write_catalog(db: Session, store_id: int, file_format: ItemBulkFormatEnum, batch_size: int) -> Iterator[str]:
+    rows = db.execute(
+        select(Item.id, Item.name, Item.introduction, Item.count, Item.price, Item.need_18)
+        .where(Item.store_id == store_id)
+        .order_by(Item.id)
+        .execution_options(yield_per=batch_size)
+    )
+    buffer = io.StringIO()
+    if file_format == ItemBulkFormatEnum.CSV:
+        writer = csv.writer(buffer)
+        writer.writerow(CATALOG_COLUMNS)
+        for partition in rows.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        #沒有任何商品時只輸出標題列
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        for partition in rows.partitions():
+            for row in partition:
+                buffer.write(json.dumps(dict(zip(CATALOG_COLUMNS, row)), ensure_ascii=False))
+                buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
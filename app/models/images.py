@@ -0,0 +1,94 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .models import ImageBlob
+
+
+"""
+圖片引用計數
+
+上傳的圖片以內容的SHA-256命名，相同的圖片只存一份
+image_blobs記錄每個檔名被多少個欄位引用，由下列欄位上的觸發器維護，
+包含ORM以外的刪除(例如外鍵的ON DELETE CASCADE)也會正確計數
+引用數歸零時記錄released_at，之後由回收程序刪除檔案
+"""
+
+IMAGE_REFERENCES = [
+    ("item_images", "path"),
+    ("items", "icon"),
+    ("stores", "icon"),
+    ("users", "icon"),
+    ("ads", "icon"),
+    ("item_report_images", "path"),
+    ("user_report_images", "path"),
+]
+
+NOW = "datetime('now', 'localtime')"
+
+#欄位為NULL時不計數
+ACQUIRE = (
+    "INSERT INTO image_blobs(filename, ref_count, released_at, created_at) SELECT {value}, 1, NULL, " + NOW + " WHERE {value} IS NOT NULL "
+    "ON CONFLICT(filename) DO UPDATE SET ref_count = ref_count + 1, released_at = NULL;"
+)
+RELEASE = (
+    "UPDATE image_blobs SET ref_count = ref_count - 1, released_at = CASE WHEN ref_count <= 1 THEN " + NOW + " ELSE released_at END "
+    "WHERE filename = {value};"
+)
+
+
+def image_ref_triggers(table: str, column: str) -> list[str]:
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_{column}_image_ai AFTER INSERT ON {table} BEGIN
+            {ACQUIRE.format(value=f"new.{column}")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_{column}_image_ad AFTER DELETE ON {table} BEGIN
+            {RELEASE.format(value=f"old.{column}")}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_{column}_image_au AFTER UPDATE OF {column} ON {table} WHEN old.{column} IS NOT new.{column} BEGIN
+            {RELEASE.format(value=f"old.{column}")}
+            {ACQUIRE.format(value=f"new.{column}")}
+        END""",
+    ]
+
+IMAGE_REF_DDL = [statement for table, column in IMAGE_REFERENCES for statement in image_ref_triggers(table, column)]
+
+IMAGE_REF_DROP = [f"DROP TRIGGER IF EXISTS {table}_{column}_image_{suffix}" for table, column in IMAGE_REFERENCES for suffix in ("au", "ad", "ai")]
+
+
+def rebuild_image_refs(connection: Connection):
+    """
+    重建觸發器並依目前的資料重新計算所有引用數
+    """
+    for statement in IMAGE_REF_DDL:
+        connection.exec_driver_sql(statement)
+    #INSERT ... SELECT搭配ON CONFLICT時SELECT一定要有WHERE，否則ON會被當成JOIN的條件
+    references = " UNION ALL ".join(f"SELECT {column} AS filename FROM {table} WHERE {column} IS NOT NULL" for table, column in IMAGE_REFERENCES)
+    connection.exec_driver_sql(
+        f"INSERT INTO image_blobs(filename, ref_count, released_at, created_at) "
+        f"SELECT filename, count(*), NULL, {NOW} FROM ({references}) WHERE true GROUP BY filename "
+        f"ON CONFLICT(filename) DO UPDATE SET ref_count = excluded.ref_count, released_at = NULL"
+    )
+    connection.exec_driver_sql(
+        f"UPDATE image_blobs SET ref_count = 0, released_at = coalesce(released_at, {NOW}) "
+        f"WHERE filename NOT IN (SELECT filename FROM ({references}))"
+    )
+
+def find_orphan_images(db: Session, filenames: list[str], released_before: datetime) -> set[str]:
+    """
+    回傳filenames中沒有被引用的檔名，引用數在released_before之後才歸零的不算，沒有紀錄的檔名一律視為孤兒
+    """
+    rows = db.execute(select(ImageBlob.filename, ImageBlob.ref_count, ImageBlob.released_at).where(ImageBlob.filename.in_(filenames))).all()
+    kept = {filename for filename, ref_count, released_at in rows if ref_count > 0 or (released_at is not None and released_at >= released_before)}
+    return set(filenames) - kept
+
+def delete_image_blobs(db: Session, filenames: list[str]):
+    db.execute(delete(ImageBlob).where(ImageBlob.filename.in_(filenames), ImageBlob.ref_count <= 0).execution_options(synchronize_session=False))
+
+def image_stats(db: Session) -> dict:
+    blobs, referenced, references = db.execute(
+        select(func.count(), func.count().filter(ImageBlob.ref_count > 0), func.coalesce(func.sum(ImageBlob.ref_count), 0))
+    ).one()
+    return {"blobs": blobs, "referenced": referenced, "released": blobs - referenced, "references": references}
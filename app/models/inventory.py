@@ -0,0 +1,92 @@
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from ..enums.base import OrderStatus
+from ..exceptions.base import OutOfStockException
+from .models import Item, Order
+
+
+"""
+商品庫存
+
+下單時就以條件式UPDATE預留庫存，庫存不足時UPDATE不會改到任何一列，
+不必先讀出庫存、在Python中檢查後再寫回，同時下單也不會超賣，交易只包含一道UPDATE
+取消未出貨的訂單時歸還預留的庫存，出貨時不再扣庫存
+出貨與取消都以訂單狀態為條件，兩者同時發生時只有一方會成功
+舊訂單(reserved為False)沒有預留，出貨時才扣庫存，取消時也不必歸還
+
+Item.count是還可以賣出的庫存，不含未出貨訂單預留的數量
+賣家修改商品或匯入時直接設定的數量也是可賣出的庫存，之後取消訂單時預留的數量會加回去
+例如庫存5、下單預留3後剩2，賣家改為9，取消訂單後為12
+"""
+
+def reserve_stock(db: Session, item_id: int, count: int) -> bool:
+    """
+    可賣出的庫存足夠時扣除count並回傳True，否則不做任何修改並回傳False
+    """
+    result = db.execute(
+        update(Item)
+        .where(Item.id == item_id, Item.count >= count)
+        .values(count=Item.count - count)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def release_stock(db: Session, item_id: int, count: int):
+    """
+    把預留的count加回可賣出的庫存，不論庫存在預留之後是否被直接設定過
+    """
+    db.execute(
+        update(Item)
+        .where(Item.id == item_id)
+        .values(count=Item.count + count)
+        .execution_options(synchronize_session=False)
+    )
+
+def place_orders(db: Session, orders: list[dict]) -> list[int]:
+    """
+    預留每筆訂單的庫存後建立訂單，回傳訂單id
+    任一商品庫存不足時拋出OutOfStockException，整個交易回滾，已預留的庫存也一併還原
+    """
+    new_orders = []
+    for order in orders:
+        if not reserve_stock(db, order["item_id"], order["count"]):
+            raise OutOfStockException(order["item_id"])
+        new_orders.append(Order(**order, reserved=True))
+    db.add_all(new_orders)
+    db.flush()
+    return [order.id for order in new_orders]
+
+def fulfil_order(db: Session, order_id: int) -> bool:
+    """
+    把未出貨的訂單改為處理中，訂單已不是未出貨時回傳False
+    沒有預留庫存的舊訂單在這時扣庫存，不足時拋出OutOfStockException
+    """
+    order = db.execute(
+        update(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.NOT_DELIVERED.value)
+        .values(status=OrderStatus.PROCESSING.value)
+        .returning(Order.item_id, Order.count, Order.reserved)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if order is None:
+        return False
+    if not order.reserved and not reserve_stock(db, order.item_id, order.count):
+        raise OutOfStockException(order.item_id)
+    return True
+
+def cancel_order(db: Session, order_id: int) -> bool:
+    """
+    刪除未出貨的訂單並歸還預留的庫存，訂單已不是未出貨時回傳False
+    """
+    order = db.execute(
+        delete(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.NOT_DELIVERED.value)
+        .returning(Order.item_id, Order.count, Order.reserved)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if order is None:
+        return False
+    if order.reserved:
+        release_stock(db, order.item_id, order.count)
+    return True
@@ -0,0 +1,73 @@
+"""
+游標(keyset)分頁
+
+路由以[(欄位, 是否遞減)]指定排序，先用order_clauses套用到查詢，再把同一份排序傳給分頁，
+以上一頁最後一筆的排序值作為游標，用WHERE條件直接跳到下一頁，不需要OFFSET也不需要COUNT(*)
+排序欄位最後必須接上唯一欄位(通常是id)，且都要是查詢主體的欄位
+每頁筆數沿用fastapi_pagination的size參數
+"""
+import base64
+import binascii
+import json
+
+from typing import Any
+
+from sqlalchemy import Select, and_, desc, or_, tuple_
+from sqlalchemy.orm import Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from fastapi_pagination import resolve_params
+
+from app.exceptions.base import InvalidCursorException
+from app.schemas.general import CursorPage
+
+
+def order_clauses(keys: list[tuple[Any, bool]]) -> list:
+    return [desc(column) if descending else column for column, descending in keys]
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, ensure_ascii=False).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, length: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise InvalidCursorException()
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursorException()
+    return values
+
+def keyset_condition(keys: list[tuple[Any, bool]], values: list):
+    #方向一致時用row value比較，SQLite可以直接沿著索引往下找
+    if len({descending for _, descending in keys}) == 1:
+        columns = tuple_(*[column for column, _ in keys])
+        return columns < tuple_(*values) if keys[0][1] else columns > tuple_(*values)
+    conditions = []
+    for i, (column, descending) in enumerate(keys):
+        previous = [keys[j][0] == values[j] for j in range(i)]
+        conditions.append(and_(*previous, column < values[i] if descending else column > values[i]))
+    return or_(*conditions)
+
+def _prepare(query: Select | Query, keys: list[tuple[Any, bool]], cursor: str | None, size: int):
+    if not keys:
+        raise ValueError("游標分頁需要排序欄位")
+    if cursor:
+        query = query.filter(keyset_condition(keys, decode_cursor(cursor, len(keys))))
+    return query.limit(size + 1)
+
+def _to_page(page_type: type[CursorPage], keys: list[tuple[Any, bool]], rows: list, size: int) -> CursorPage:
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column, _ in keys])
+    return page_type.model_validate({"items": rows, "size": size, "next_cursor": next_cursor}, from_attributes=True)
+
+def cursor_paginate(query: Query, keys: list[tuple[Any, bool]], cursor: str | None, page_type: type[CursorPage]) -> CursorPage:
+    size = resolve_params().size
+    query = _prepare(query, keys, cursor, size)
+    return _to_page(page_type, keys, query.all(), size)
+
+async def acursor_paginate(db: AsyncSession, query: Select, keys: list[tuple[Any, bool]], cursor: str | None, page_type: type[CursorPage]) -> CursorPage:
+    size = resolve_params().size
+    query = _prepare(query, keys, cursor, size)
+    return _to_page(page_type, keys, list((await db.scalars(query)).unique().all()), size)
@@ -0,0 +1,13 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+from .models import Item
+
+
+"""
+列表查詢共用的載入設定
+
+FullItemSchema需要store與images，
+在主查詢中一併載入，避免每一列再各自查詢
+"""
+
+full_item_options = (joinedload(Item.store), selectinload(Item.images))
@@ -1,17 +1,17 @@
-from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
-from sqlalchemy import ForeignKey, String, Integer, Boolean, DateTime, func, select, case
+from sqlalchemy.orm import Mapped, mapped_column, relationship, synonym, DeclarativeBase
+from sqlalchemy import ForeignKey, String, Integer, Boolean, DateTime, Float, Index, Text
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from datetime import datetime, timedelta
 
 from typing import Literal
 
-from ..enums.base import OrderStatus
+from ..enums.base import OrderStatus, EmailOutboxStatus
 
 
 class Base(DeclarativeBase):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, unique=True, index=True, nullable=False, autoincrement=True)
-    created_at: Mapped[int] = mapped_column(DateTime, nullable=False, default=datetime.now())
+    created_at: Mapped[int] = mapped_column(DateTime, nullable=False, default=datetime.now)
 
 
 class User(Base):
@@ -24,6 +24,7 @@ class User(Base):
     is_admin: Mapped[bool] = mapped_column(Boolean, unique=False, index=False, nullable=False, default=False)
     is_verified: Mapped[bool] = mapped_column(Boolean, unique=False, index=False, nullable=False, default=False)
     icon: Mapped[str] = mapped_column(String(length=200), unique=False, index=False, nullable=True, default=None)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=True, default=datetime.now, onupdate=datetime.now)
 
     verification: Mapped["Verification"] = relationship("Verification", primaryjoin="User.id == Verification.user_id", uselist=False, back_populates="user")
     store: Mapped["Store"] = relationship("Store", primaryjoin="User.id == Store.user_id", uselist=False, back_populates="owner")
@@ -38,7 +39,7 @@ class User(Base):
 
 class Verification(Base):
     __tablename__ = "verifications"
-    code: Mapped[str] = mapped_column(String(length=50), unique=False, index=False, nullable=False)
+    code: Mapped[str] = mapped_column(String(length=50), unique=False, index=True, nullable=False)
     last_request: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=True, index=True, nullable=False)
 
@@ -55,7 +56,7 @@ class City(Base):
 class District(Base):
     __tablename__ = "districts"
     name: Mapped[str] = mapped_column(String(length=10), unique=False, index=False, nullable=False)
-    city_id: Mapped[int] = mapped_column(ForeignKey("cities.id", ondelete="RESTRICT", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    city_id: Mapped[int] = mapped_column(ForeignKey("cities.id", ondelete="RESTRICT", onupdate="CASCADE"), unique=False, index=True, nullable=False)
 
     city: Mapped["City"] = relationship("City", primaryjoin="City.id == District.city_id", uselist=False, back_populates="districts")
     stores: Mapped[list["Store"]] = relationship("Store", primaryjoin="Store.district_id == District.id", uselist=True, back_populates="district")
@@ -67,7 +68,8 @@ class Store(Base):
     introduction: Mapped[str] = mapped_column(String(length=500), unique=False, index=False, nullable=False)
     icon: Mapped[str] = mapped_column(String(length=100), unique=False, index=False, nullable=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=True, index=True, nullable=False)
-    district_id: Mapped[int] = mapped_column(ForeignKey("districts.id", ondelete="RESTRICT", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    district_id: Mapped[int] = mapped_column(ForeignKey("districts.id", ondelete="RESTRICT", onupdate="CASCADE"), unique=False, index=True, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=True, default=datetime.now, onupdate=datetime.now)
 
     owner: Mapped["User"] = relationship("User", primaryjoin="User.id == Store.user_id", uselist=False, back_populates="store")
     district: Mapped["District"] = relationship("District", primaryjoin="District.id == Store.district_id", uselist=False, back_populates="stores")
@@ -83,29 +85,23 @@ class Item(Base):
     price: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False)
     store_id: Mapped[int] = mapped_column(ForeignKey("stores.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
     need_18: Mapped[bool] = mapped_column(Boolean, unique=False, index=False, nullable=False, default=False)
+    rating_sum: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False, default=0, server_default="0")
+    rating_count: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False, default=0, server_default="0")
+    rating_average: Mapped[float] = mapped_column(Float, unique=False, index=False, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=True, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_items_store_id_id", "store_id", "id"),
+        Index("ix_items_rating_count_id", "rating_count", "id"),
+        Index("ix_items_rating_average_id", "rating_average", "id"),
+    )
 
     store: Mapped["Store"] = relationship("Store", primaryjoin="Store.id == Item.store_id", uselist=False, back_populates="items")
     images: Mapped[list["ItemImage"]] = relationship("ItemImage", primaryjoin="ItemImage.item_id == Item.id", uselist=True, back_populates="item", order_by="ItemImage.id")
     comments: Mapped[list["Comment"]] = relationship("Comment", primaryjoin="Comment.item_id == Item.id", uselist=True)
 
-    @hybrid_property
-    def comment_counts(self):
-        return len(self.comments)
-    
-    @comment_counts.expression
-    def comment_counts(cls):
-        return select(func.count()).select_from(Comment.__table__).where(cls.id == Comment.item_id).as_scalar()
-
-    @hybrid_property
-    def average_stars(self) -> float:
-        if self.comment_counts <= 0:
-            return 0
-        else:
-            return sum((comment.stars for comment in self.comments)) / self.comment_counts
-        
-    @average_stars.expression
-    def average_stars(cls) -> float:
-        return case((cls.comment_counts == 0, 0), else_=select(func.sum(Comment.stars)).scalar_subquery() / cls.comment_counts)
+    comment_counts: Mapped[int] = synonym("rating_count")
+    average_stars: Mapped[float] = synonym("rating_average")
 
 class ItemImage(Base):
     __tablename__ = "item_images"
@@ -132,17 +128,36 @@ class Order(Base):
             OrderStatus.DONE
         ]
     ] = mapped_column(Integer, unique=False, index=False, nullable=False, default=OrderStatus.NOT_DELIVERED.value)
+    #下單時已預留庫存，舊訂單為False，出貨時才扣庫存
+    reserved: Mapped[bool] = mapped_column(Boolean, unique=False, index=False, nullable=False, default=False, server_default="0")
+
+    __table_args__ = (
+        Index("ix_orders_user_id_id", "user_id", "id"),
+        Index("ix_orders_item_id_status", "item_id", "status"),
+        Index("ix_orders_created_at_item_id_count", "created_at", "item_id", "count"),
+    )
 
     owner: Mapped["User"] = relationship("User", primaryjoin="User.id == Order.user_id", uselist=False, back_populates="orders")
     item: Mapped["Item"] = relationship("Item", primaryjoin="Order.item_id == Item.id", uselist=False)
 
 
+
+class ItemPopularity(Base):
+    __tablename__ = "item_popularities"
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE", onupdate="CASCADE"), unique=True, index=True, nullable=False)
+    score: Mapped[float] = mapped_column(Float, unique=False, index=True, nullable=False)
+    order_count: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False)
+
 class CartItem(Base):
     __tablename__ = "cart_items"
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
-    item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="RESTRICT", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="RESTRICT", onupdate="CASCADE"), unique=False, index=True, nullable=False)
     count: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False)
 
+    __table_args__ = (
+        Index("ix_cart_items_user_id_id", "user_id", "id"),
+    )
+
     owner: Mapped["User"] = relationship("User", primaryjoin="User.id == CartItem.user_id", uselist=False, back_populates="cart_items")
     item: Mapped["Item"] = relationship("Item", primaryjoin="Item.id == CartItem.item_id", uselist=False)
 
@@ -150,7 +165,11 @@ class CartItem(Base):
 class BuyNextTimeItem(Base):
     __tablename__ = "buy_next_time_items"
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
-    item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
+
+    __table_args__ = (
+        Index("ix_buy_next_time_items_user_id_item_id", "user_id", "item_id"),
+    )
 
     owner: Mapped["User"] = relationship("User", primaryjoin="User.id == BuyNextTimeItem.user_id", uselist=False, back_populates="buy_next_time_items")
     item: Mapped["Item"] = relationship("Item", primaryjoin="Item.id == BuyNextTimeItem.item_id", uselist=False)
@@ -158,8 +177,8 @@ class BuyNextTimeItem(Base):
 
 class ItemReport(Base):
     __tablename__ = "item_reports"
-    reporter_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
-    reported_item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    reporter_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
+    reported_item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
     reason: Mapped[str] = mapped_column(String(length=500), unique=False, index=False, nullable=False)
 
     reporter: Mapped["User"] = relationship("User", primaryjoin="User.id == ItemReport.reporter_id", uselist=False)
@@ -169,8 +188,8 @@ class ItemReport(Base):
 
 class UserReport(Base):
     __tablename__ = "user_reports"
-    reporter_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
-    reported_user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    reporter_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
+    reported_user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
     reason: Mapped[str] = mapped_column(String(length=500), unique=False, index=False, nullable=False)
 
     reporter: Mapped["User"] = relationship("User", primaryjoin="User.id == UserReport.reporter_id", uselist=False)
@@ -180,26 +199,61 @@ class UserReport(Base):
 
 class ItemReportImage(Base):
     __tablename__ = "item_report_images"
-    report_id: Mapped[int] = mapped_column(ForeignKey("item_reports.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    report_id: Mapped[int] = mapped_column(ForeignKey("item_reports.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
     path: Mapped[str] = mapped_column(String(length=100), unique=False, index=False, nullable=False)
 
 
 class UserReportImage(Base):
     __tablename__ = "user_report_images"
-    report_id: Mapped[int] = mapped_column(ForeignKey("user_reports.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    report_id: Mapped[int] = mapped_column(ForeignKey("user_reports.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
     path: Mapped[str] = mapped_column(String(length=100), unique=False, index=False, nullable=False)
 
 
 class Comment(Base):
     __tablename__ = "comments"
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=True, nullable=False)
     item_id: Mapped[int] = mapped_column(ForeignKey("items.id", ondelete="CASCADE", onupdate="CASCADE"), unique=False, index=False, nullable=False)
     stars: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False)
     content: Mapped[str] = mapped_column(String(length=200), unique=False, index=False, nullable=True, default=None)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=True, default=datetime.now, onupdate=datetime.now)
+
+    __table_args__ = (
+        Index("ix_comments_item_id_user_id", "item_id", "user_id"),
+    )
 
     user: Mapped["User"] = relationship("User", primaryjoin="Comment.user_id == User.id", uselist=False)
 
+
 class Ad(Base):
     __tablename__ = "ads"
     url: Mapped[str] = mapped_column(String(length=500), unique=False, index=False, nullable=False)
-    icon: Mapped[str] = mapped_column(String(length=200), unique=False, index=False, nullable=True, default=None)
\ No newline at end of file
+    icon: Mapped[str] = mapped_column(String(length=200), unique=False, index=False, nullable=True, default=None)
+    weight: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False, default=1, server_default="1")
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    recipients: Mapped[str] = mapped_column(String(length=500), unique=False, index=False, nullable=False)
+    subject: Mapped[str] = mapped_column(String(length=200), unique=False, index=False, nullable=False)
+    body: Mapped[str] = mapped_column(Text, unique=False, index=False, nullable=False)
+    subtype: Mapped[str] = mapped_column(String(length=10), unique=False, index=False, nullable=False, default="plain")
+    status: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False, default=EmailOutboxStatus.PENDING.value)
+    attempts: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False, default=0)
+    #PENDING時為下次可寄送的時間，SENDING時為租約到期的時間
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=False, default=datetime.now)
+    sent_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=True, default=None)
+    last_error: Mapped[str] = mapped_column(String(length=500), unique=False, index=False, nullable=True, default=None)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+    #檔名為內容的SHA-256加上副檔名，舊的uuid檔名也會有一筆
+    filename: Mapped[str] = mapped_column(String(length=200), unique=True, index=True, nullable=False)
+    #由觸發器維護，不要在程式中直接修改
+    ref_count: Mapped[int] = mapped_column(Integer, unique=False, index=False, nullable=False, default=0)
+    #引用數歸零的時間
+    released_at: Mapped[datetime] = mapped_column(DateTime, unique=False, index=False, nullable=True, default=None)
\ No newline at end of file
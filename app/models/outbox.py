@@ -0,0 +1,89 @@
+import json
+
+from datetime import datetime, timedelta
+
+from fastapi_mail import MessageSchema, MessageType
+
+from sqlalchemy import and_, delete, select, update
+from sqlalchemy.orm import Session
+
+from ..enums.base import EmailOutboxStatus
+from .models import EmailOutbox
+
+
+"""
+郵件寄件匣
+
+郵件與觸發它的資料(例如Verification)在同一個交易中寫入email_outbox，
+再由背景的drainer分批認領並寄出，行程重啟也不會遺失，寄送保證為至少一次
+認領時把狀態改為SENDING並設定租約，認領者在租約到期前沒有回報結果時會被重新認領
+郵件內文可能含有驗證碼或新密碼，寄出或放棄(SENT、FAILED)時立即清空，
+這兩種狀態的紀錄保留email_outbox_retention_hours供查詢寄送狀況，之後由purge_emails刪除
+"""
+
+def enqueue_email(db: Session, message: MessageSchema):
+    db.add(EmailOutbox(
+        recipients=json.dumps([str(recipient) for recipient in message.recipients]),
+        subject=message.subject,
+        body=message.body,
+        subtype=message.subtype.value,
+    ))
+
+def to_message(row) -> MessageSchema:
+    return MessageSchema(subject=row.subject, recipients=json.loads(row.recipients), body=row.body, subtype=MessageType(row.subtype))
+
+def claim_emails(db: Session, limit: int, lease_seconds: float) -> list:
+    now = datetime.now()
+    claimable = and_(
+        EmailOutbox.status.in_([EmailOutboxStatus.PENDING.value, EmailOutboxStatus.SENDING.value]),
+        EmailOutbox.next_attempt_at <= now,
+    )
+    ids = select(EmailOutbox.id).where(claimable).order_by(EmailOutbox.next_attempt_at).limit(limit).scalar_subquery()
+    return db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), claimable)
+        .values(status=EmailOutboxStatus.SENDING.value, next_attempt_at=now + timedelta(seconds=lease_seconds), attempts=EmailOutbox.attempts + 1)
+        .returning(EmailOutbox.id, EmailOutbox.recipients, EmailOutbox.subject, EmailOutbox.body, EmailOutbox.subtype, EmailOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+def mark_emails(db: Session, results: dict[int, tuple[int, Exception | None]], max_attempts: int, backoff_seconds: float):
+    """
+    results為{id: (已嘗試次數, 錯誤)}，錯誤為None表示寄送成功
+    失敗時依嘗試次數指數退避，超過max_attempts次後標記為FAILED
+    """
+    now = datetime.now()
+    sent_ids = [email_id for email_id, (_, error) in results.items() if error is None]
+    if sent_ids:
+        db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(sent_ids))
+            .values(status=EmailOutboxStatus.SENT.value, sent_at=now, last_error=None, body="")
+            .execution_options(synchronize_session=False)
+        )
+    for email_id, (attempts, error) in results.items():
+        if error is None:
+            continue
+        if attempts >= max_attempts:
+            values = {"status": EmailOutboxStatus.FAILED.value, "body": ""}
+        else:
+            values = {"status": EmailOutboxStatus.PENDING.value, "next_attempt_at": now + timedelta(seconds=backoff_seconds * 2 ** (attempts - 1))}
+        db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == email_id)
+            .values(**values, last_error=str(error)[:500])
+            .execution_options(synchronize_session=False)
+        )
+
+def purge_emails(db: Session, retention_hours: float) -> int:
+    """
+    刪除超過保留期限的SENT與FAILED紀錄，兩者的next_attempt_at都是最後一次認領時的租約到期時間
+    """
+    return db.execute(
+        delete(EmailOutbox)
+        .where(
+            EmailOutbox.status.in_([EmailOutboxStatus.SENT.value, EmailOutboxStatus.FAILED.value]),
+            EmailOutbox.next_attempt_at < datetime.now() - timedelta(hours=retention_hours),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
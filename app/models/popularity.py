@@ -0,0 +1,48 @@
+import heapq
+import random
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.settings.base import settings
+
+from .models import Order, ItemPopularity
+
+
+"""
+商品熱門度
+
+依近期訂單數量計分，越久以前的訂單依半衰期遞減，
+定期重算後寫入item_popularities，/items/hot直接從這張表加權抽樣
+"""
+
+def refresh_item_popularity(db: Session):
+    now = datetime.now()
+    ordered_on = func.date(Order.created_at)
+    rows = db.execute(
+        select(Order.item_id, ordered_on, func.sum(Order.count))
+        .where(Order.created_at >= now - timedelta(days=settings.popularity_window_days))
+        .group_by(ordered_on, Order.item_id)
+    ).all()
+
+    scores: dict[int, float] = {}
+    order_counts: dict[int, int] = {}
+    for item_id, day, count in rows:
+        age = (now.date() - date.fromisoformat(day)).days
+        scores[item_id] = scores.get(item_id, 0.0) + count * 0.5 ** (age / settings.popularity_half_life_days)
+        order_counts[item_id] = order_counts.get(item_id, 0) + count
+
+    top = heapq.nlargest(settings.popularity_size, scores.items(), key=lambda score: score[1])
+    db.execute(delete(ItemPopularity))
+    if top:
+        db.execute(insert(ItemPopularity), [
+            {"item_id": item_id, "score": score, "order_count": order_counts[item_id], "created_at": now}
+            for item_id, score in top
+        ])
+
+def weighted_sample(population: list[tuple[int, float]], k: int) -> list[int]:
+    #Efraimidis-Spirakis：以u^(1/w)為鍵取最大的k筆，即為依權重不放回抽樣
+    keyed = [(random.random() ** (1 / weight), item_id) for item_id, weight in population if weight > 0]
+    return [item_id for _, item_id in heapq.nlargest(k, keyed)]
@@ -0,0 +1,28 @@
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from .models import Item, Comment
+
+
+def apply_rating_change(db: Session, item_id: int, stars_delta: int, count_delta: int):
+    new_sum = Item.rating_sum + stars_delta
+    new_count = Item.rating_count + count_delta
+    db.execute(
+        update(Item)
+        .where(Item.id == item_id)
+        .values(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating_average=case((new_count <= 0, 0.0), else_=new_sum * 1.0 / new_count)
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def recompute_item_ratings(db: Session, item_ids: list[int] | None = None):
+    rating_sum = select(func.coalesce(func.sum(Comment.stars), 0)).where(Comment.item_id == Item.id).scalar_subquery()
+    rating_count = select(func.count(Comment.id)).where(Comment.item_id == Item.id).scalar_subquery()
+    rating_average = select(func.coalesce(func.avg(Comment.stars), 0.0)).where(Comment.item_id == Item.id).scalar_subquery()
+    statement = update(Item).values(rating_sum=rating_sum, rating_count=rating_count, rating_average=rating_average)
+    if item_ids is not None:
+        statement = statement.where(Item.id.in_(item_ids))
+    db.execute(statement.execution_options(synchronize_session=False))
@@ -0,0 +1,67 @@
+from sqlalchemy import Select, column, func, literal_column, or_, select, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query
+
+from .models import Item
+
+
+"""
+商品全文檢索
+
+items_fts是以items為外部內容的FTS5虛擬資料表，由觸發器與items保持同步，
+使用trigram分詞，比對方式與原本的LIKE '%關鍵字%'相同，中文也適用
+"""
+
+items_fts = table("items_fts", column("rowid"), column("items_fts"))
+
+#trigram至少要三個字元才能比對，較短的關鍵字退回LIKE
+MIN_FTS_TERM_LENGTH = 3
+
+#bm25權重依序為name、introduction
+NAME_WEIGHT = 10.0
+INTRODUCTION_WEIGHT = 1.0
+
+ITEMS_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(name, introduction, content='items', content_rowid='id', tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts(rowid, name, introduction) VALUES (new.id, new.name, new.introduction);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, introduction) VALUES ('delete', old.id, old.name, old.introduction);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF name, introduction ON items BEGIN
+        INSERT INTO items_fts(items_fts, rowid, name, introduction) VALUES ('delete', old.id, old.name, old.introduction);
+        INSERT INTO items_fts(rowid, name, introduction) VALUES (new.id, new.name, new.introduction);
+    END""",
+]
+
+
+def rebuild_items_fts(connection: Connection):
+    for statement in ITEMS_FTS_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    connection.exec_driver_sql("INSERT INTO items_fts(items_fts) VALUES ('optimize')")
+
+def fts_match_expression(terms: list[str]) -> str:
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+def search_items(items_query: Select | Query, name: str):
+    """
+    以空白分隔的關鍵字做OR查詢，回傳(查詢, 相關度排序欄位)
+    相關度排序欄位為None時表示沒有用到全文檢索
+    """
+    terms = [term for term in name.split(" ") if term]
+    fts_terms = [term for term in terms if len(term) >= MIN_FTS_TERM_LENGTH]
+    like_terms = [Item.name.like(f"%{term}%") for term in terms if len(term) < MIN_FTS_TERM_LENGTH]
+    if not fts_terms:
+        return (items_query.filter(or_(*like_terms)) if like_terms else items_query), None
+
+    matches = (
+        select(items_fts.c.rowid.label("item_id"), func.bm25(literal_column("items_fts"), NAME_WEIGHT, INTRODUCTION_WEIGHT).label("rank"))
+        .where(items_fts.c.items_fts.match(fts_match_expression(fts_terms)))
+        .subquery("matches")
+    )
+    if like_terms:
+        items_query = items_query.outerjoin(matches, matches.c.item_id == Item.id).filter(or_(matches.c.item_id.is_not(None), *like_terms))
+        return items_query, matches.c.rank.nulls_last()
+    return items_query.join(matches, matches.c.item_id == Item.id), matches.c.rank
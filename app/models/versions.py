@@ -0,0 +1,31 @@
+from sqlalchemy import Select, func, select
+
+from .models import Item, Store, Comment, User
+
+
+"""
+條件式GET用的版本查詢
+
+只讀取修改時間與數量，不載入ORM物件
+商品圖片異動與商品刪除時會一併更新商品/商店的updated_at
+"""
+
+def item_version(item_id: int) -> Select:
+    return select(Item.updated_at, Store.updated_at).join(Store, Store.id == Item.store_id).where(Item.id == item_id)
+
+def store_version(store_id: int) -> Select:
+    return (
+        select(Store.updated_at, func.count(Item.id), func.max(Item.updated_at))
+        .outerjoin(Item, Item.store_id == Store.id)
+        .where(Store.id == store_id)
+        .group_by(Store.id)
+    )
+
+def item_comments_version(item_id: int) -> Select:
+    return (
+        select(Item.updated_at, func.count(Comment.id), func.max(Comment.updated_at), func.max(User.updated_at))
+        .outerjoin(Comment, Comment.item_id == Item.id)
+        .outerjoin(User, User.id == Comment.user_id)
+        .where(Item.id == item_id)
+        .group_by(Item.id)
+    )
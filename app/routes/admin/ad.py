@@ -1,5 +1,3 @@
-import uuid
-
 from fastapi import Depends, Response, UploadFile
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
@@ -8,18 +6,20 @@ from sqlalchemy.orm import Session
 
 from app.models.models import User, Ad
 from app.dependencies.base import get_current_admin_user, get_db
+from app.dependencies.ad_pool import ad_pool
+from app.dependencies.uploads import save_image
 from app.schemas.admin import CUAdSchema
 from app.schemas.general import AdSchema
-from app.settings.base import settings
 
 
 router = APIRouter(prefix="/ads")
 
 @router.post("", response_model=AdSchema)
 def create_ad(data: CUAdSchema, user: User = Depends(get_current_admin_user), db: Session = Depends(get_db)):
-    ad = Ad(url=data.url)
+    ad = Ad(url=data.url, weight=data.weight)
     db.add(ad)
     db.commit()
+    ad_pool.load(db)
     return ad
 
 @router.put("/{ad_id}", response_model=AdSchema)
@@ -28,7 +28,9 @@ def update_ad(ad_id: int, data: CUAdSchema, user: User = Depends(get_current_adm
     if not ad:
         return JSONResponse(content={"message": "廣告不存在"}, status_code=404)
     ad.url = data.url
+    ad.weight = data.weight
     db.commit()
+    ad_pool.load(db)
     return ad
 
 @router.put("/{ad_id}/icon")
@@ -36,20 +38,10 @@ def update_ad_icon(ad_id: int, icon: UploadFile, user: User = Depends(get_curren
     ad = db.query(Ad).filter(Ad.id == ad_id).first()
     if not ad:
         return JSONResponse(content={"message": "廣告不存在"}, status_code=404)
-    if icon.content_type != "image/jpeg" and icon.content_type != "image/png" and icon.content_type != "image/gif":
-        return JSONResponse(content={"message": "只接受.jpeg和.png檔案"}, status_code=400)
-    if icon.size > 2048 * 2048:
-        return JSONResponse(content={"message": "廣告圖標大小請勿超過4MB"}, status_code=400)
-    icon.file.seek(0)
-    filename = str(uuid.uuid4())
-    if icon.content_type == "image/jpeg":
-        filename = filename + ".jpg"
-    elif icon.content_type == "image/png":
-        filename = filename + ".png"
-    with open(f"{settings.static_files_root}/{filename}", "wb") as image:
-        image.write(icon.file.read())
+    filename = save_image(icon, ("jpeg", "png", "gif"))
     ad.icon = filename
     db.commit()
+    ad_pool.load(db)
     return Response(content=None, status_code=204)
 
 @router.delete("/{ad_id}", response_model=AdSchema)
@@ -59,4 +51,5 @@ def delete_ad(ad_id: int, user: User = Depends(get_current_admin_user), db: Sess
         return JSONResponse(content={"message": "廣告不存在"}, status_code=404)
     db.delete(ad)
     db.commit()
+    ad_pool.load(db)
     return ad
\ No newline at end of file
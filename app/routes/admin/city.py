@@ -5,6 +5,7 @@ from fastapi.routing import APIRouter
 from sqlalchemy.orm import Session
 
 from app.dependencies.base import get_current_user, get_db
+from app.dependencies.reference import reference_cache
 from app.schemas.admin import CUCitySchema
 from app.schemas.general import CitySchema
 from app.models.models import City, User
@@ -20,6 +21,7 @@ def create_city(data: CUCitySchema, user: User = Depends(get_current_user), db:
     city = City(**data.model_dump())
     db.add(city)
     db.commit()
+    reference_cache.load(db)
     return city
 
 @router.put("/{city_id}", response_model=CitySchema, status_code=201)
@@ -32,6 +34,7 @@ def create_city(city_id: int, data: CUCitySchema, user: User = Depends(get_curre
         return JSONResponse(content={"message": "已存在同名的縣市"}, status_code=409)
     city.name = data.name
     db.commit()
+    reference_cache.load(db)
     return city
 
 @router.delete("/{city_id}", response_model=CitySchema, status_code=201)
@@ -41,4 +44,5 @@ def create_city(city_id: int, user: User = Depends(get_current_user), db: Sessio
         return JSONResponse(content={"message": "城市不存在"}, status_code=400)
     db.delete(city)
     db.commit()
+    reference_cache.load(db)
     return Response(status_code=204)
\ No newline at end of file
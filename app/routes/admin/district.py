@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from app.schemas.admin import CUDistrictSchema
 from app.schemas.general import FullDistrictSchema
 from app.dependencies.base import get_current_user, get_db
+from app.dependencies.reference import reference_cache
 from app.models.models import City, District, Store, User
 
 
@@ -30,6 +31,7 @@ def create_district(data: CUDistrictSchema, user: User = Depends(get_current_use
     district = District(**data.model_dump())
     db.add(district)
     db.commit()
+    reference_cache.load(db)
     return district
 
 @router.put("/{district_id}", response_model=FullDistrictSchema)
@@ -46,6 +48,7 @@ def update_district(district_id: int, data: CUDistrictSchema, user: User = Depen
     district.name = data.name
     district.city_id = data.city_id
     db.commit()
+    reference_cache.load(db)
     return district
 
 @router.delete("/{district_id}")
@@ -58,4 +61,5 @@ def delete_district(district_id: int, user: User = Depends(get_current_user), db
         return JSONResponse(content={"message": "無法刪除，仍有商店位於該區域中"}, status_code=400)
     db.delete(district)
     db.commit()
+    reference_cache.load(db)
     return Response(status_code=204)
\ No newline at end of file
@@ -3,21 +3,26 @@ from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 
 from fastapi_pagination.ext.sqlalchemy import paginate
-from fastapi_pagination import add_pagination, Page
+from fastapi_pagination import add_pagination, pagination_ctx, Page
 
-from sqlalchemy import desc
 from sqlalchemy.orm import Session
 
+from app.enums.base import PagingModeEnum
 from app.models.models import User, ItemReport
+from app.models.keyset import cursor_paginate, order_clauses
 from app.dependencies.base import get_current_user, get_db
 from app.schemas.admin import ItemReportSchema
+from app.schemas.general import PagingQuerySchema, CursorPage
 
 
 router = APIRouter(prefix="/item_reports")
 
-@router.get("", response_model=Page[ItemReportSchema])
-def get_all_item_reports(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    item_reports_query = db.query(ItemReport).order_by(desc(ItemReport.id))
+@router.get("", response_model=Page[ItemReportSchema] | CursorPage[ItemReportSchema], dependencies=[Depends(pagination_ctx(Page[ItemReportSchema]))])
+def get_all_item_reports(paging: PagingQuerySchema = Depends(), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    order_keys = [(ItemReport.id, True)]
+    item_reports_query = db.query(ItemReport).order_by(*order_clauses(order_keys))
+    if paging.paging == PagingModeEnum.CURSOR:
+        return cursor_paginate(item_reports_query, order_keys, paging.cursor, CursorPage[ItemReportSchema])
     return paginate(item_reports_query)
 
 @router.get("/{item_report_id}", response_model=ItemReportSchema)
@@ -1,7 +1,7 @@
 from fastapi import Depends
 from fastapi.routing import APIRouter
 
-from app.routes.admin import district, city, user_report, item_report, users, ad
+from app.routes.admin import district, city, user_report, item_report, users, ad, stats
 
 from app.dependencies.base import get_current_admin_user
 
@@ -13,4 +13,5 @@ router.include_router(city.router)
 router.include_router(user_report.router)
 router.include_router(item_report.router)
 router.include_router(users.router)
-router.include_router(ad.router)
\ No newline at end of file
+router.include_router(ad.router)
+router.include_router(stats.router)
\ No newline at end of file
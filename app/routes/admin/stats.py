@@ -0,0 +1,40 @@
+from fastapi import Depends
+from fastapi.routing import APIRouter
+
+from sqlalchemy.orm import Session
+
+from app.dependencies.writer import write_serializer
+from app.dependencies.item_cache import item_listing_cache
+from app.dependencies.password_hasher import password_hasher
+from app.dependencies.mailer import mail_worker
+from app.dependencies.image_variants import image_resizer
+from app.dependencies.base import get_db
+from app.models.images import image_stats
+from app.schemas.admin import WriterStatsSchema, ItemCacheStatsSchema, PasswordHasherStatsSchema, MailStatsSchema, ImageStatsSchema, ImageVariantStatsSchema
+
+
+router = APIRouter(prefix="/stats")
+
+@router.get("/writer", response_model=WriterStatsSchema)
+def get_writer_stats():
+    return write_serializer.stats()
+
+@router.get("/item_cache", response_model=ItemCacheStatsSchema)
+def get_item_cache_stats():
+    return item_listing_cache.stats()
+
+@router.get("/password_hasher", response_model=PasswordHasherStatsSchema)
+def get_password_hasher_stats():
+    return password_hasher.stats()
+
+@router.get("/mail", response_model=MailStatsSchema)
+def get_mail_stats():
+    return mail_worker.stats()
+
+@router.get("/images", response_model=ImageStatsSchema)
+def get_image_stats(db: Session = Depends(get_db)):
+    return image_stats(db)
+
+@router.get("/image_variants", response_model=ImageVariantStatsSchema)
+def get_image_variant_stats():
+    return image_resizer.stats()
\ No newline at end of file
@@ -3,20 +3,26 @@ from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 
 from fastapi_pagination.ext.sqlalchemy import paginate
-from fastapi_pagination import add_pagination, Page
+from fastapi_pagination import add_pagination, pagination_ctx, Page
 
 from sqlalchemy.orm import Session
 
 from app.dependencies.base import get_current_user, get_db
+from app.enums.base import PagingModeEnum
 from app.schemas.admin import UserRepoertSchema
+from app.schemas.general import PagingQuerySchema, CursorPage
 from app.models.models import User, UserReport
+from app.models.keyset import cursor_paginate, order_clauses
 
 
 router = APIRouter(prefix="/user_reports")
 
-@router.get("", response_model=Page[UserRepoertSchema])
-def get_all_user_reports(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user_reports_query = db.query(UserReport)
+@router.get("", response_model=Page[UserRepoertSchema] | CursorPage[UserRepoertSchema], dependencies=[Depends(pagination_ctx(Page[UserRepoertSchema]))])
+def get_all_user_reports(paging: PagingQuerySchema = Depends(), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    order_keys = [(UserReport.id, True)]
+    user_reports_query = db.query(UserReport).order_by(*order_clauses(order_keys))
+    if paging.paging == PagingModeEnum.CURSOR:
+        return cursor_paginate(user_reports_query, order_keys, paging.cursor, CursorPage[UserRepoertSchema])
     return paginate(user_reports_query)
 
 @router.get("/{user_report_id}", response_model=UserRepoertSchema)
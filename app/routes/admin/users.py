@@ -9,10 +9,14 @@ from sqlalchemy import desc, or_
 from sqlalchemy.orm import Session
 
 from app.dependencies.base import get_current_user, get_db
-from app.enums.base import UserQuerySortByEnum
+from app.dependencies.item_cache import item_listing_cache
+from app.dependencies.principal import principal_cache
+from app.enums.base import OrderStatus, UserQuerySortByEnum
 from app.schemas.general import UserSchema
 from app.schemas.admin import CUUserSchema, UserQuerySchema
-from app.models.models import User
+from app.models.models import User, Comment, Order
+from app.models.inventory import cancel_order
+from app.models.ratings import recompute_item_ratings
 
 
 router = APIRouter(prefix="/users")
@@ -82,6 +86,7 @@ def admin_update_user(user_id:int, data: CUUserSchema, user: User = Depends(get_
         return JSONResponse(content={"message": "使用者不存在"}, status_code=404)
     user.is_admin = data.is_admin
     db.commit()
+    principal_cache.invalidate(user.username)
     return user
 
 @router.delete("/{user_id}")
@@ -89,8 +94,19 @@ def admin_delete_user(user_id:int, data: CUUserSchema, user: User = Depends(get_
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         return JSONResponse(content={"message": "使用者不存在"}, status_code=404)
+    username = user.username
+    rated_item_ids = [item_id for item_id, in db.query(Comment.item_id).filter(Comment.user_id == user_id).distinct()]
+    db.query(Comment).filter(Comment.user_id == user_id).delete(synchronize_session=False)
+    #未出貨的訂單在同一個交易中取消，歸還預留的庫存
+    order_ids = [order_id for order_id, in db.query(Order.id).filter(Order.user_id == user_id, Order.status == OrderStatus.NOT_DELIVERED.value)]
+    for order_id in order_ids:
+        cancel_order(db, order_id)
     db.delete(user)
+    db.flush()
+    recompute_item_ratings(db, rated_item_ids)
     db.commit()
+    principal_cache.revoke(user_id, username)
+    item_listing_cache.clear()
     return Response(status_code=204)
 
 add_pagination(router)
\ No newline at end of file
@@ -1,23 +1,25 @@
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
-from fastapi import Depends
+from fastapi import Depends, Request
 
 from sqlalchemy.orm import Session
 
-from app.models.models import City
 from app.schemas.general import FullCitySchema
-from app.dependencies.base import  get_db
+from app.dependencies.base import  get_read_db
+from app.dependencies.reference import reference_cache
 
 
 router = APIRouter(prefix="/cities")
 
 @router.get("", response_model=list[FullCitySchema])
-def get_all_cities(db: Session = Depends(get_db)):
-    return db.query(City).order_by(City.id).all()
+def get_all_cities(request: Request, db: Session = Depends(get_read_db)):
+    reference_cache.ensure_loaded(db)
+    return reference_cache.cities.response(request)
 
 @router.get("/{city_id}", response_model=FullCitySchema)
-def get_specfic_city(city_id: int, db: Session = Depends(get_db)):
-    city = db.query(City).filter(City.id == city_id).first()
+def get_specfic_city(city_id: int, request: Request, db: Session = Depends(get_read_db)):
+    reference_cache.ensure_loaded(db)
+    city = reference_cache.city_bodies.get(city_id)
     if not city:
         return JSONResponse(content={"message": "資源不存在"}, status_code=400)
-    return city
\ No newline at end of file
+    return city.response(request)
\ No newline at end of file
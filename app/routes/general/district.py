@@ -1,23 +1,25 @@
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
-from fastapi import Depends
+from fastapi import Depends, Request
 
 from sqlalchemy.orm import Session
 
-from app.models.models import District
 from app.schemas.general import FullDistrictSchema
-from app.dependencies.base import  get_db
+from app.dependencies.base import  get_read_db
+from app.dependencies.reference import reference_cache
 
 
 router = APIRouter(prefix="/districts")
 
 @router.get("", response_model=list[FullDistrictSchema])
-def get_all_cities(db: Session = Depends(get_db)):
-    return db.query(District).order_by(District.id).all()
+def get_all_cities(request: Request, db: Session = Depends(get_read_db)):
+    reference_cache.ensure_loaded(db)
+    return reference_cache.districts.response(request)
 
 @router.get("/{district_id}", response_model=FullDistrictSchema)
-def get_specfic_city(district_id: int, db: Session = Depends(get_db)):
-    district = db.query(District).filter(District.id == district_id).first()
+def get_specfic_city(district_id: int, request: Request, db: Session = Depends(get_read_db)):
+    reference_cache.ensure_loaded(db)
+    district = reference_cache.district_bodies.get(district_id)
     if not district:
         return JSONResponse(content={"message": "資源不存在"}, status_code=400)
-    return district
\ No newline at end of file
+    return district.response(request)
\ No newline at end of file
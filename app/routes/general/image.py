@@ -0,0 +1,38 @@
+import os
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRouter
+
+from PIL import Image, UnidentifiedImageError
+
+from app.dependencies.image_variants import image_resizer, VARIANT_MEDIA_TYPES
+from app.enums.base import ImageVariantFormatEnum, ImageVariantPresetEnum
+from app.exceptions.base import ImageResizerBusyException
+from app.settings.base import settings
+
+
+router = APIRouter(prefix="/images")
+
+@router.get("/{preset}/{filename}")
+def get_image_variant(preset: ImageVariantPresetEnum, filename: str, format: ImageVariantFormatEnum = ImageVariantFormatEnum.WEBP):
+    if os.path.basename(filename) != filename or filename.startswith(".") or not os.path.isfile(f"{settings.static_files_root}/{filename}"):
+        return JSONResponse(content={"message": "圖片不存在"}, status_code=404)
+    #縮圖在回傳路徑之後、讀取之前可能被快取淘汰，這時重新縮放一次
+    for _ in range(2):
+        try:
+            path = image_resizer.variant(filename, preset, format)
+        except FileNotFoundError:
+            #來源圖片在縮放途中被回收
+            return JSONResponse(content={"message": "圖片不存在"}, status_code=404)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            #OSError為截斷或損毀的圖片
+            return JSONResponse(content={"message": "無法讀取圖片"}, status_code=400)
+        try:
+            with open(path, "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            continue
+        #縮圖的內容只由檔名決定，檔名就是內容的雜湊
+        return Response(content=content, media_type=VARIANT_MEDIA_TYPES[format], headers={"Cache-Control": "public, max-age=31536000, immutable"})
+    raise ImageResizerBusyException()
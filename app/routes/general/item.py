@@ -2,105 +2,158 @@ import random
 
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
-from fastapi import Depends
-
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlalchemy import paginate
-
-from sqlalchemy import desc,  or_
-from sqlalchemy.orm import Session
-
-from app.enums.base import ItemQueryOrderByEnum
-from app.models.models import Item, Comment, Order, User
-from app.schemas.general import FullCommentSchema, FullItemSchema, CUCommentSchema, ItemQuerySchema
-from app.dependencies.base import  get_current_user, get_db
+from fastapi import Depends, Request, Response
+
+from fastapi_pagination import Page, add_pagination, pagination_ctx
+from fastapi_pagination.ext.sqlalchemy import apaginate
+
+from sqlalchemy import desc,  or_, select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.enums.base import ItemQueryOrderByEnum, ItemSearchModeEnum, PagingModeEnum
+from app.models.models import Item, Comment
+from app.models.loaders import full_item_options
+from app.models.keyset import acursor_paginate, order_clauses
+from app.models.search import search_items
+from app.models.ratings import apply_rating_change
+from app.models.versions import item_version, item_comments_version
+from app.schemas.general import FullCommentSchema, FullItemSchema, CUCommentSchema, ItemQuerySchema, PagingQuerySchema, CursorPage, PrincipalSchema
+from app.dependencies.base import  get_current_principal, get_async_db, get_async_read_db
+from app.dependencies.writer import get_async_writer
+from app.dependencies.conditional import conditional_get
+from app.dependencies.popularity import popularity_pool
+from app.dependencies.item_cache import item_listing_cache, listing_key, item_tag, store_tag, order_tag
+from app.settings.base import settings
 
 
 router = APIRouter(prefix="/items")
 
-@router.get("", response_model=Page[FullItemSchema], status_code=200)
-def get_items(query: ItemQuerySchema = Depends(), db: Session = Depends(get_db)):
-    items_query = db.query(Item)
+@router.get("", response_model=Page[FullItemSchema] | CursorPage[FullItemSchema], status_code=200, dependencies=[Depends(pagination_ctx(Page[FullItemSchema]))])
+async def get_items(query: ItemQuerySchema = Depends(), paging: PagingQuerySchema = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    if item_listing_cache.enabled:
+        key = listing_key(query, paging)
+        body = item_listing_cache.get(key)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+        generation = item_listing_cache.generation
+
+    items_query = select(Item).options(*full_item_options)
 
     if query.need18 is not None:
         items_query = items_query.filter(or_(Item.need_18 == False, Item.need_18 == query.need18))
     else:
         items_query = items_query.filter(Item.need_18 == False)
 
+    rank = None
     if query.name is not None:
-        names = query.name.split(" ")
-        items_query = items_query.filter(or_(*[Item.name.like(f"%{name}%") for name in names]))
-
-    if query.order_by is not None:
-        if query.order_by == ItemQueryOrderByEnum.ID:
-            items_query = items_query.order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.NAME:
-            items_query = items_query.order_by(desc(Item.name) if query.desc is True else Item.name).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.STORE_ID:
-            items_query = items_query.order_by(desc(Item.store_id) if query.desc is True else Item.store_id).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.PRICE:
-            items_query = items_query.order_by(Item.price if query.desc is True else desc(Item.price)).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.HOTTEST:
-            items_query = items_query.order_by(Item.comment_counts if query.desc is True else desc(Item.comment_counts)).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.BEST:
-            items_query = items_query.order_by(Item.average_stars if query.desc is True else desc(Item.average_stars)).order_by(Item.id if query.desc is True else desc(Item.id))
+        if query.search_mode == ItemSearchModeEnum.FULLTEXT:
+            items_query, rank = search_items(items_query, query.name)
+        else:
+            names = query.name.split(" ")
+            items_query = items_query.filter(or_(*[Item.name.like(f"%{name}%") for name in names]))
+
+    #id放在最後，讓排序唯一，游標分頁也需要
+    id_key = (Item.id, query.desc is not True)
+    if query.order_by == ItemQueryOrderByEnum.NAME:
+        order_keys = [(Item.name, query.desc is True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.STORE_ID:
+        order_keys = [(Item.store_id, query.desc is True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.PRICE:
+        order_keys = [(Item.price, query.desc is not True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.HOTTEST:
+        order_keys = [(Item.comment_counts, query.desc is not True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.BEST:
+        order_keys = [(Item.average_stars, query.desc is not True), id_key]
     else:
-        items_query = items_query.order_by(Item.id if query.desc is True else desc(Item.id))
-        
-    return paginate(items_query)
+        order_keys = [id_key]
+    #游標分頁只能依items的欄位排序，相關度排序只用在一般分頁
+    if query.order_by is None and rank is not None and paging.paging != PagingModeEnum.CURSOR:
+        items_query = items_query.order_by(rank)
+    items_query = items_query.order_by(*order_clauses(order_keys))
+
+    if paging.paging == PagingModeEnum.CURSOR:
+        page = await acursor_paginate(db, items_query, order_keys, paging.cursor, CursorPage[FullItemSchema])
+    else:
+        page = await apaginate(db, items_query)
+    if not item_listing_cache.enabled:
+        return page
+    body = page.model_dump_json().encode()
+    tags = [item_tag(item.id) for item in page.items] + [store_tag(item.store_id) for item in page.items]
+    if query.order_by is not None:
+        tags.append(order_tag(query.order_by))
+    item_listing_cache.put(key, body, tags, generation)
+    return Response(content=body, media_type="application/json")
 
 @router.get("/hot", response_model=list[FullItemSchema], status_code=200)
-def get_hot_items(db: Session = Depends(get_db)):
-    hot_items_raw = db.query(Item).outerjoin(Order, Order.item_id == Item.id).order_by(Order.count, Item.id).limit(1000).all()
-    hot_items_raw_len = len(hot_items_raw)
-    rand_k = 20 if hot_items_raw_len >= 20 else hot_items_raw_len
-    hot_items = random.sample(population=hot_items_raw, k=rand_k)
-    return sorted(hot_items, key=lambda item : item.id, reverse=False)
+async def get_hot_items(db: AsyncSession = Depends(get_async_read_db)):
+    item_ids = await popularity_pool.sample(db, k=20)
+    if len(item_ids) < 20:
+        #熱門度資料不足時，從最新的商品中隨機補足
+        latest_ids = (await db.scalars(select(Item.id).filter(Item.id.not_in(item_ids)).order_by(desc(Item.id)).limit(settings.popularity_size))).all()
+        item_ids += random.sample(population=latest_ids, k=min(20 - len(item_ids), len(latest_ids)))
+    return (await db.scalars(select(Item).options(*full_item_options).filter(Item.id.in_(item_ids)).order_by(Item.id))).all()
 
 @router.get("/best", response_model=list[FullItemSchema], status_code=200)
-def get_best_items(db: Session = Depends(get_db)):
-    good_items_raw = db.query(Item).order_by(Item.id).limit(1000).all()
+async def get_best_items(db: AsyncSession = Depends(get_async_read_db)):
+    good_items_raw = (await db.scalars(select(Item).options(*full_item_options).order_by(Item.id).limit(1000))).all()
     good_items_raw_len = len(good_items_raw)
     rand_k = 20 if good_items_raw_len >= 20 else good_items_raw_len
     good_items = random.sample(population=good_items_raw, k=rand_k)
     return sorted(good_items, key=lambda item : item.id, reverse=True)
 
 @router.get("/{item_id}", response_model=FullItemSchema)
-def get_specific_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == item_id).first()
+async def get_specific_item(item_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    version = (await db.execute(item_version(item_id))).first()
+    if not version:
+        return JSONResponse(content={"message": "資源不存在"}, status_code=404)
+    not_modified = conditional_get(request, response, version)
+    if not_modified:
+        return not_modified
+    item = (await db.scalars(select(Item).options(*full_item_options).filter(Item.id == item_id))).first()
     if not item:
         return JSONResponse(content={"message": "資源不存在"}, status_code=404)
     return item
 
 @router.get("/{item_id}/comments", response_model=Page[FullCommentSchema])
-def get_specific_item_comments(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
+async def get_specific_item_comments(item_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    version = (await db.execute(item_comments_version(item_id))).first()
+    if not version:
         return JSONResponse(content={"message": "資源不存在"}, status_code=404)
-    comments_query = db.query(Comment).filter(Comment.item_id == item_id)
-    return paginate(comments_query)
+    not_modified = conditional_get(request, response, version)
+    if not_modified:
+        return not_modified
+    comments_query = select(Comment).options(selectinload(Comment.user)).filter(Comment.item_id == item_id)
+    return await apaginate(db, comments_query)
 
 @router.put("/{item_id}/comments", response_model=FullCommentSchema)
-def add_specific_item_comments(item_id: int, data: CUCommentSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == item_id).first()
+async def add_specific_item_comments(item_id: int, data: CUCommentSchema, user: PrincipalSchema = Depends(get_current_principal), db: AsyncSession = Depends(get_async_db), write = Depends(get_async_writer)):
+    item = await db.get(Item, item_id)
     if not item:
         return JSONResponse(content={"message": "資源不存在"}, status_code=404)
-    comment = db.query(Comment).filter(Comment.item_id == item_id, Comment.user_id == user.id).first()
-    if comment:
-        comment.content = data.content
-        comment.stars = data.stars
-    else:
-        comment = Comment(**data.model_dump(), user_id=user.id, item_id=item_id)
-        db.add(comment)
-    db.commit()
+    def work(session: Session):
+        comment = session.query(Comment).filter(Comment.item_id == item_id, Comment.user_id == user.id).first()
+        if comment:
+            apply_rating_change(session, item_id, data.stars - comment.stars, 0)
+            comment.content = data.content
+            comment.stars = data.stars
+        else:
+            apply_rating_change(session, item_id, data.stars, 1)
+            comment = Comment(**data.model_dump(), user_id=user.id, item_id=item_id)
+            session.add(comment)
+        session.flush()
+        return comment.id
+    comment = await db.get(Comment, await write(work))
+    item_listing_cache.invalidate(item_tag(item_id), order_tag(ItemQueryOrderByEnum.HOTTEST), order_tag(ItemQueryOrderByEnum.BEST))
+    await db.refresh(comment, ["user"])
     return comment
 
 @router.get("/{item_id}/comments/{comment_id}", response_model=FullItemSchema)
-def get_specific_item(item_id: int, comment_id: int, db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == item_id).first()
+async def get_specific_item(item_id: int, comment_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    item = await db.get(Item, item_id)
     if not item:
         return JSONResponse(content={"message": "資源不存在"}, status_code=404)
-    comment = db.query(Comment).filter(Comment.item_id == item_id, Comment.id == comment_id).first()
+    comment = (await db.scalars(select(Comment).filter(Comment.item_id == item_id, Comment.id == comment_id))).first()
     if not comment:
         return JSONResponse(content={"message": "資源不存在"}, status_code=404)
     return comment
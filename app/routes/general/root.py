@@ -1,6 +1,6 @@
 from fastapi.routing import APIRouter
 
-from app.routes.general import district, item, city, store, item_report, ad
+from app.routes.general import district, item, city, store, item_report, ad, image
 
 
 router = APIRouter(prefix="/general", tags=["General"])
@@ -9,4 +9,5 @@ router.include_router(city.router)
 router.include_router(district.router)
 router.include_router(store.router)
 router.include_router(item_report.router)
-router.include_router(ad.router)
\ No newline at end of file
+router.include_router(ad.router)
+router.include_router(image.router)
\ No newline at end of file
@@ -1,61 +1,82 @@
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
-from fastapi import Depends
+from fastapi import Depends, Request, Response
 
-from fastapi_pagination import Page, add_pagination
-from fastapi_pagination.ext.sqlalchemy import paginate
+from fastapi_pagination import Page, add_pagination, pagination_ctx
+from fastapi_pagination.ext.sqlalchemy import apaginate
 
-from sqlalchemy import desc, or_
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.enums.base import ItemQueryOrderByEnum
+from app.enums.base import ItemQueryOrderByEnum, ItemSearchModeEnum, PagingModeEnum
 from app.models.models import Item, Store
-from app.schemas.general import FullItemSchema, FullStoreSchema, ItemQuerySchema
-from app.dependencies.base import  get_db
+from app.models.loaders import full_item_options
+from app.models.keyset import acursor_paginate, order_clauses
+from app.models.search import search_items
+from app.models.versions import store_version
+from app.schemas.general import FullItemSchema, FullStoreSchema, ItemQuerySchema, PagingQuerySchema, CursorPage
+from app.dependencies.base import  get_async_read_db
+from app.dependencies.conditional import conditional_get
 
 
 router = APIRouter(prefix="/stores")
 
 @router.get("/{store_id}", response_model=FullStoreSchema)
-def get_specific_store(store_id: int, db: Session = Depends(get_db)):
-    store = db.query(Store).filter(Store.id == store_id).first()
+async def get_specific_store(store_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+    version = (await db.execute(store_version(store_id))).first()
+    if not version:
+        return JSONResponse(content={"message": "商店不存在"}, status_code=404)
+    not_modified = conditional_get(request, response, version)
+    if not_modified:
+        return not_modified
+    store = (await db.scalars(select(Store).options(selectinload(Store.items)).filter(Store.id == store_id))).first()
     if not store:
         return JSONResponse(content={"message": "商店不存在"}, status_code=404)
     return store
 
-@router.get("/{store_id}/items", response_model=Page[FullItemSchema])
-def get_specific_store(store_id: int, query: ItemQuerySchema = Depends(), db: Session = Depends(get_db)):
-    store = db.query(Store).filter(Store.id == store_id).first()
+@router.get("/{store_id}/items", response_model=Page[FullItemSchema] | CursorPage[FullItemSchema], dependencies=[Depends(pagination_ctx(Page[FullItemSchema]))])
+async def get_specific_store(store_id: int, query: ItemQuerySchema = Depends(), paging: PagingQuerySchema = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    store = await db.get(Store, store_id)
     if not store:
         return JSONResponse(content={"message": "商店不存在"}, status_code=404)
     
-    items_query = db.query(Item).filter(Item.store_id == store_id)
+    items_query = select(Item).options(*full_item_options).filter(Item.store_id == store_id)
 
     if query.need18 is not None:
         items_query = items_query.filter(or_(Item.need_18 == False, Item.need_18 == query.need18))
     else:
         items_query = items_query.filter(Item.need_18 == False)
 
+    rank = None
     if query.name is not None:
-        names = query.name.split(" ")
-        items_query = items_query.filter(or_(*[Item.name.like(f"%{name}%") for name in names]))
-
-    if query.order_by is not None:
-        if query.order_by == ItemQueryOrderByEnum.ID:
-            items_query = items_query.order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.NAME:
-            items_query = items_query.order_by(desc(Item.name) if query.desc is True else Item.name).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.STORE_ID:
-            items_query = items_query.order_by(desc(Item.store_id) if query.desc is True else Item.store_id).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.PRICE:
-            items_query = items_query.order_by(Item.price if query.desc is True else desc(Item.price)).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.HOTTEST:
-            items_query = items_query.order_by(Item.comment_counts if query.desc is True else desc(Item.comment_counts)).order_by(Item.id if query.desc is True else desc(Item.id))
-        elif query.order_by == ItemQueryOrderByEnum.BEST:
-            items_query = items_query.order_by(Item.average_stars if query.desc is True else desc(Item.average_stars)).order_by(Item.id if query.desc is True else desc(Item.id))
+        if query.search_mode == ItemSearchModeEnum.FULLTEXT:
+            items_query, rank = search_items(items_query, query.name)
+        else:
+            names = query.name.split(" ")
+            items_query = items_query.filter(or_(*[Item.name.like(f"%{name}%") for name in names]))
+
+    #id放在最後，讓排序唯一，游標分頁也需要
+    id_key = (Item.id, query.desc is not True)
+    if query.order_by == ItemQueryOrderByEnum.NAME:
+        order_keys = [(Item.name, query.desc is True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.STORE_ID:
+        order_keys = [(Item.store_id, query.desc is True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.PRICE:
+        order_keys = [(Item.price, query.desc is not True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.HOTTEST:
+        order_keys = [(Item.comment_counts, query.desc is not True), id_key]
+    elif query.order_by == ItemQueryOrderByEnum.BEST:
+        order_keys = [(Item.average_stars, query.desc is not True), id_key]
     else:
-        items_query = items_query.order_by(Item.id if query.desc is True else desc(Item.id))
+        order_keys = [id_key]
+    #游標分頁只能依items的欄位排序，相關度排序只用在一般分頁
+    if query.order_by is None and rank is not None and paging.paging != PagingModeEnum.CURSOR:
+        items_query = items_query.order_by(rank)
+    items_query = items_query.order_by(*order_clauses(order_keys))
 
-    return paginate(items_query)
+    if paging.paging == PagingModeEnum.CURSOR:
+        return await acursor_paginate(db, items_query, order_keys, paging.cursor, CursorPage[FullItemSchema])
+    return await apaginate(db, items_query)
 
 add_pagination(router)
\ No newline at end of file
@@ -4,23 +4,25 @@ from fastapi import Depends, Response
 
 from fastapi_pagination import add_pagination
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
-from app.models.models import BuyNextTimeItem, Item, User
+from app.models.models import BuyNextTimeItem, Item
+from app.models.loaders import full_item_options
 from app.schemas.user import CUBuyNextTimeItemSchema
-from app.schemas.general import FullBuyNextTimeItemSchema
-from app.dependencies.base import get_current_user, get_db
+from app.schemas.general import FullBuyNextTimeItemSchema, PrincipalSchema
+from app.dependencies.base import get_current_principal, get_db
+from app.dependencies.writer import get_writer
 
 
 router = APIRouter(prefix="/liked_items")
 
 @router.get("", response_model=list[FullBuyNextTimeItemSchema])
-def get_user_buy_next_time_items(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user_buy_next_time_items = db.query(BuyNextTimeItem).filter(BuyNextTimeItem.user_id == user.id).all()
+def get_user_buy_next_time_items(user: PrincipalSchema = Depends(get_current_principal), db: Session = Depends(get_db)):
+    user_buy_next_time_items = db.query(BuyNextTimeItem).options(selectinload(BuyNextTimeItem.item).options(*full_item_options)).filter(BuyNextTimeItem.user_id == user.id).all()
     return user_buy_next_time_items
 
 @router.post("")
-def create_user_buy_next_time_item(data: CUBuyNextTimeItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_user_buy_next_time_item(data: CUBuyNextTimeItemSchema, user: PrincipalSchema = Depends(get_current_principal), db: Session = Depends(get_db), write = Depends(get_writer)):
     item = db.query(Item).filter(Item.id == data.item_id).first()
     if not item:
         return JSONResponse(content={"message": "資源不存在"}, status_code=400)
@@ -31,18 +33,21 @@ def create_user_buy_next_time_item(data: CUBuyNextTimeItemSchema, user: User = D
     buy_next_time_item = db.query(BuyNextTimeItem).filter(BuyNextTimeItem.user_id == user.id, BuyNextTimeItem.item_id == item.id).first()
     if buy_next_time_item:
         return buy_next_time_item
-    new_buy_next_time_item = BuyNextTimeItem(item_id=data.item_id, user_id=user.id)
-    db.add(new_buy_next_time_item)
-    db.commit()
-    return new_buy_next_time_item
+    def work(session: Session):
+        new_buy_next_time_item = BuyNextTimeItem(item_id=data.item_id, user_id=user.id)
+        session.add(new_buy_next_time_item)
+        session.flush()
+        return new_buy_next_time_item.id
+    return db.get(BuyNextTimeItem, write(work))
 
 @router.delete("/{buy_next_time_item_id}")
-def delete_user_buy_next_time_item(buy_next_time_item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_user_buy_next_time_item(buy_next_time_item_id: int, user: PrincipalSchema = Depends(get_current_principal), db: Session = Depends(get_db), write = Depends(get_writer)):
     buy_next_time_item = db.query(BuyNextTimeItem).filter(BuyNextTimeItem.user_id == user.id, BuyNextTimeItem.id == buy_next_time_item_id).first()
     if not buy_next_time_item:
         return JSONResponse(content={"message", "資源不存在或無權存取"}, status_code=400)
-    db.delete(buy_next_time_item)
-    db.commit()
+    def work(session: Session):
+        session.delete(session.get(BuyNextTimeItem, buy_next_time_item_id))
+    write(work)
     return Response(status_code=204)
 
 add_pagination(router)
\ No newline at end of file
@@ -4,49 +4,57 @@ from fastapi import Depends, Response
 
 from fastapi_pagination import add_pagination
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.models import CartItem, Item, User
+from app.models.models import CartItem, Item
 from app.schemas.user import CUCartItemSchema
-from app.schemas.general import FullCartItemSchema
-from app.dependencies.base import get_current_user, get_db
+from app.schemas.general import FullCartItemSchema, PrincipalSchema
+from app.dependencies.base import get_current_principal, get_async_db
+from app.dependencies.writer import get_async_writer
 
 
 router = APIRouter(prefix="/cart_items")
 
 @router.get("", response_model=list[FullCartItemSchema])
-def get_user_cart_items(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user_cart_items = db.query(CartItem).filter(CartItem.user_id == user.id).all()
+async def get_user_cart_items(user: PrincipalSchema = Depends(get_current_principal), db: AsyncSession = Depends(get_async_db)):
+    user_cart_items = (await db.scalars(select(CartItem).options(selectinload(CartItem.item)).filter(CartItem.user_id == user.id))).all()
     return user_cart_items
 
 @router.post("")
-def create_user_cart_item(data: CUCartItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == data.item_id).first()
+async def create_user_cart_item(data: CUCartItemSchema, user: PrincipalSchema = Depends(get_current_principal), db: AsyncSession = Depends(get_async_db), write = Depends(get_async_writer)):
+    item = (await db.scalars(select(Item).options(selectinload(Item.store)).filter(Item.id == data.item_id))).first()
     if not item:
         return JSONResponse(content={"message": "資源不存在"}, status_code=400)
     if item.store.user_id == user.id:
         return JSONResponse(content={"message": "你不能將自己商店中的商品加入購物車"}, status_code=400)
-    cart_item = CartItem(**data.model_dump(), user_id=user.id)
-    db.add(cart_item)
-    db.commit()
-    return cart_item
+    def work(session: Session):
+        cart_item = CartItem(**data.model_dump(), user_id=user.id)
+        session.add(cart_item)
+        session.flush()
+        return cart_item.id
+    return await db.get(CartItem, await write(work))
 
 @router.put("/{cart_item_id}")
-def update_user_cart_item(cart_item_id: int, data: CUCartItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    cart_item = db.query(CartItem).filter(CartItem.user_id == user.id, CartItem.id == cart_item_id).first()
+async def update_user_cart_item(cart_item_id: int, data: CUCartItemSchema, user: PrincipalSchema = Depends(get_current_principal), db: AsyncSession = Depends(get_async_db), write = Depends(get_async_writer)):
+    cart_item = (await db.scalars(select(CartItem).filter(CartItem.user_id == user.id, CartItem.id == cart_item_id))).first()
     if not cart_item:
         return JSONResponse(content={"message", "資源不存在或無權存取"}, status_code=400)
-    cart_item.count = data.count
-    db.commit()
+    def work(session: Session):
+        session.get(CartItem, cart_item_id).count = data.count
+    await write(work)
+    await db.refresh(cart_item)
     return cart_item
 
 @router.delete("/{cart_item_id}")
-def delete_user_cart_item(cart_item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    cart_item = db.query(CartItem).filter(CartItem.user_id == user.id, CartItem.id == cart_item_id).first()
+async def delete_user_cart_item(cart_item_id: int, user: PrincipalSchema = Depends(get_current_principal), db: AsyncSession = Depends(get_async_db), write = Depends(get_async_writer)):
+    cart_item = (await db.scalars(select(CartItem).filter(CartItem.user_id == user.id, CartItem.id == cart_item_id))).first()
     if not cart_item:
         return JSONResponse(content={"message", "資源不存在或無權存取"}, status_code=400)
-    db.delete(cart_item)
-    db.commit()
+    def work(session: Session):
+        session.delete(session.get(CartItem, cart_item_id))
+    await write(work)
     return Response(status_code=204)
 
 add_pagination(router)
\ No newline at end of file
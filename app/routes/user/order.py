@@ -1,24 +1,30 @@
+from functools import partial
+
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
 from fastapi import Depends, Response
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from app.models.models import Item, Order, User
+from app.models.loaders import full_item_options
+from app.models.inventory import cancel_order, place_orders
 from app.schemas.user import CUOrderSchema
 from app.schemas.general import OrderSchema
 from app.dependencies.base import get_current_user, get_db
+from app.dependencies.writer import get_writer
+from app.dependencies.item_cache import item_listing_cache, item_tag
 from app.enums.base import OrderStatus
 
 
 router = APIRouter(prefix="/orders")
 
 @router.get("", response_model=list[OrderSchema])
-def get_user_owned_orders(user: User = Depends(get_current_user)):
-    return user.orders
+def get_user_owned_orders(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    return db.query(Order).options(joinedload(Order.item).options(*full_item_options)).filter(Order.user_id == user.id).all()
 
 @router.post("", response_model=list[OrderSchema])
-def create_user_order(data: list[CUOrderSchema], user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_user_order(data: list[CUOrderSchema], user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     orders = []
     for order in data:
         item = db.query(Item).filter(Item.id == order.item_id).first()
@@ -26,18 +32,24 @@ def create_user_order(data: list[CUOrderSchema], user: User = Depends(get_curren
             return JSONResponse(content={"message": "資源不存在"}, status_code=400)
         if user.store and item.store_id == user.store.id:
             return JSONResponse(content={"message": "你不能購買自己商店裡的物品"}, status_code=400)
-        orders.append(Order(**order.model_dump(), user_id=user.id, total_price=int(item.price*order.count)))
-    db.add_all(orders)
-    db.commit()
-    return orders
+        if order.count <= 0:
+            return JSONResponse(content={"message": "購買數量必須大於0"}, status_code=400)
+        orders.append({**order.model_dump(), "user_id": user.id, "total_price": int(item.price*order.count)})
+    #庫存不足時拋出OutOfStockException，所有訂單都不會建立
+    order_ids = write(partial(place_orders, orders=orders))
+    for item_id in {order["item_id"] for order in orders}:
+        item_listing_cache.invalidate(item_tag(item_id))
+    return db.query(Order).filter(Order.id.in_(order_ids)).order_by(Order.id).all()
 
 @router.delete("/{order_id}")
-def delete_user_order(order_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_user_order(order_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     order = db.query(Order).filter(Order.id == order_id, Order.user_id == user.id).first()
     if not order:
         return JSONResponse(content={"message": "資源不存在或無權存取"}, status_code=400)
     if order.status > OrderStatus.NOT_DELIVERED.value:
         return JSONResponse(content={"message": "賣家已出貨，你無法取消訂單。"}, status_code=400)
-    db.delete(order)
-    db.commit()
+    item_id = order.item_id
+    if not write(partial(cancel_order, order_id=order_id)):
+        return JSONResponse(content={"message": "賣家已出貨，你無法取消訂單。"}, status_code=400)
+    item_listing_cache.invalidate(item_tag(item_id))
     return Response(status_code=204)
\ No newline at end of file
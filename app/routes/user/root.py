@@ -1,5 +1,3 @@
-import uuid
-
 from fastapi import Depends, Response, UploadFile
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRouter
@@ -8,6 +6,9 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from app.dependencies.base import get_current_user, get_db, get_password_hash
+from app.dependencies.writer import get_writer
+from app.dependencies.principal import principal_cache
+from app.dependencies.uploads import save_image
 from app.models.models import User
 from app.schemas.general import RegisterSchema, UserSchema
 from app.routes.user import store, order, cart_item, buy_next_time_item
@@ -25,41 +26,41 @@ def get_user_info(user: User = Depends(get_current_user)):
     return user
 
 @router.put("", response_model=UserSchema)
-def update_user_data(data: RegisterSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_user_data(data: RegisterSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     user_exist = db.query(User).filter(User.id != user.id, or_(User.username == data.username, User.email == data.email)).first()
     if user_exist:
         return JSONResponse(content={"message": "重複的使用者名稱或電子郵件信箱"}, status_code=409)
-    user.username = data.username
-    user.email = data.email
-    if len(data.password) > 0:
-        user.password = get_password_hash(data.password)
-    db.commit()
+    password = get_password_hash(data.password) if len(data.password) > 0 else None
+    username = user.username
+    def work(session: Session):
+        target = session.get(User, user.id)
+        target.username = data.username
+        target.email = data.email
+        if password is not None:
+            target.password = password
+    write(work)
+    principal_cache.invalidate(username, data.username)
+    db.refresh(user)
     return user
 
+def set_user_icon(user_id: int, icon: str | None):
+    def work(session: Session):
+        session.get(User, user_id).icon = icon
+    return work
+
 @router.put("/icon", response_model=UserSchema)
-def update_user_icon(icon: UploadFile | None = None, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_user_icon(icon: UploadFile | None = None, user: User = Depends(get_current_user), write = Depends(get_writer)):
     if icon is None:
-        user.icon = None
-        db.commit()
+        write(set_user_icon(user.id, None))
+        principal_cache.invalidate(user.username)
         return Response(content=None, status_code=204)
-    if icon.content_type != "image/jpeg" and icon.content_type != "image/png":
-        return JSONResponse(content={"message": "只接受.jpeg和.png檔案"}, status_code=400)
-    if icon.size > 2048 * 2048:
-        return JSONResponse(content={"message": "icon大小請勿超過1MB"}, status_code=400)
-    icon.file.seek(0)
-    filename = str(uuid.uuid4())
-    if icon.content_type == "image/jpeg":
-        filename = filename + ".jpg"
-    elif icon.content_type == "image/png":
-        filename = filename + ".png"
-    with open(f"app/static/{filename}", "wb") as image:
-        image.write(icon.file.read())
-    user.icon = filename
-    db.commit()
+    filename = save_image(icon)
+    write(set_user_icon(user.id, filename))
+    principal_cache.invalidate(user.username)
     return Response(content=None, status_code=204)
 
 @router.delete("/icon")
-def delete_user_icon(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user.icon = None
-    db.commit()
+def delete_user_icon(user: User = Depends(get_current_user), write = Depends(get_writer)):
+    write(set_user_icon(user.id, None))
+    principal_cache.invalidate(user.username)
     return Response(content=None, status_code=204)
\ No newline at end of file
@@ -1,25 +1,46 @@
-import uuid
+from datetime import datetime
+from functools import partial
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.routing import APIRouter
 from fastapi import Depends, Response, UploadFile
 
-from fastapi_pagination import Page, add_pagination
+from fastapi_pagination import Page, add_pagination, pagination_ctx
 from fastapi_pagination.ext.sqlalchemy import paginate
 
 from sqlalchemy import desc, or_
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
-from app.enums.base import ItemQueryOrderByEnum, OrderStatus
-from app.models.models import BuyNextTimeItem, CartItem, Item, ItemImage, ItemReport, Order, User, Store, District
-from app.schemas.user import CUStoreSchema, CUItemSchema
-from app.schemas.general import FullItemSchema, FullOrderSchema, ItemQuerySchema, StoreSchema
-from app.dependencies.base import get_current_user, get_db
+from app.enums.base import ItemBulkFormatEnum, ItemQueryOrderByEnum, ItemSearchModeEnum, OrderStatus, PagingModeEnum
+from app.models.models import BuyNextTimeItem, CartItem, Item, ItemImage, ItemReport, Order, User, Store
+from app.models.loaders import full_item_options
+from app.models.keyset import cursor_paginate, order_clauses
+from app.models.search import search_items
+from app.models.inventory import cancel_order, fulfil_order
+from app.models.catalog import parse_catalog_row, read_catalog, upsert_catalog, write_catalog
+from app.schemas.user import CUStoreSchema, CUItemSchema, ItemImportResultSchema
+from app.schemas.general import FullItemSchema, FullOrderSchema, ItemQuerySchema, StoreSchema, PagingQuerySchema, CursorPage
+from app.dependencies.base import get_current_user, get_db, ReadSessionLocal
+from app.dependencies.writer import get_writer
+from app.dependencies.reference import reference_cache
+from app.dependencies.item_cache import item_listing_cache, item_tag, store_tag
+from app.dependencies.uploads import save_image, save_images
+from app.exceptions.base import OutOfStockException
 from app.settings.base import settings
 
 
 router = APIRouter(prefix="/store")
 
+def set_store_icon(store_id: int, icon: str | None):
+    def work(session: Session):
+        session.get(Store, store_id).icon = icon
+    return work
+
+def set_item_icon(item_id: int, icon: str | None):
+    def work(session: Session):
+        session.get(Item, item_id).icon = icon
+    return work
+
 #取得使用者的商店
 @router.get("", response_model=StoreSchema)
 def get_user_store(user: User = Depends(get_current_user)):
@@ -29,70 +50,69 @@ def get_user_store(user: User = Depends(get_current_user)):
 
 #為使用者創建商店
 @router.post("", response_model=StoreSchema)
-def create_user_store(data: CUStoreSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_user_store(data: CUStoreSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if user.store:
         return JSONResponse(content={"message": "你已經創建了一個商店"}, status_code=409)
-    if not db.query(District).filter(District.id == data.district_id).first():
+    if not reference_cache.has_district(db, data.district_id):
         return JSONResponse(content={"message": "該區域不存在"}, status_code=400)
     store_exist = db.query(Store).filter(Store.name == data.name).first()
     if store_exist:
         return JSONResponse(content={"message": "已存在同名的商店"}, status_code=409)
-    store = Store(**data.model_dump(), user_id=user.id)
-    db.add(store)
-    db.commit()
-    return store
+    def work(session: Session):
+        store = Store(**data.model_dump(), user_id=user.id)
+        session.add(store)
+        session.flush()
+        return store.id
+    return db.get(Store, write(work))
 
 #更新使用者的商店
 @router.put("")
-def update_user_store(data: CUStoreSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_user_store(data: CUStoreSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
-    if not db.query(District).filter(District.id == data.district_id).first():
+    if not reference_cache.has_district(db, data.district_id):
         return JSONResponse(content={"message": "該區域不存在"}, status_code=400)
     store_exist = db.query(Store).filter(Store.id != user.store.id, Store.name == data.name).first()
     if store_exist:
         return JSONResponse(content={"message": "已存在同名的商店"}, status_code=409)
-    user.store.name = data.name
-    user.store.introduction = data.introduction
-    user.store.district_id = data.district_id
-    db.commit()
+    store_id = user.store.id
+    def work(session: Session):
+        store = session.get(Store, store_id)
+        store.name = data.name
+        store.introduction = data.introduction
+        store.district_id = data.district_id
+    write(work)
+    item_listing_cache.invalidate(store_tag(store_id))
+    db.refresh(user.store)
     return user.store
 
 #刪除使用者的商店
 @router.delete("")
-def delete_user_store(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_user_store(user: User = Depends(get_current_user), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
-    db.delete(user.store)
-    db.commit()
+    store_id = user.store.id
+    def work(session: Session):
+        session.delete(session.get(Store, store_id))
+    write(work)
+    item_listing_cache.clear()
     return Response(content=None, status_code=204)
 
 @router.put("/icon")
-def update_user_store_icon(icon: UploadFile, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_user_store_icon(icon: UploadFile, user: User = Depends(get_current_user), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
-    if icon.content_type != "image/jpeg" and icon.content_type != "image/png":
-        return JSONResponse(content={"message": "只接受.jpeg和.png檔案"}, status_code=400)
-    if icon.size > 2048 * 2048:
-        return JSONResponse(content={"message": "icon大小請勿超過1MB"}, status_code=400)
-    icon.file.seek(0)
-    filename = str(uuid.uuid4())
-    if icon.content_type == "image/jpeg":
-        filename = filename + ".jpg"
-    elif icon.content_type == "image/png":
-        filename = filename + ".png"
-    with open(f"{settings.static_files_root}/{filename}", "wb") as image:
-        image.write(icon.file.read())
-    user.store.icon = filename
-    db.commit()
+    filename = save_image(icon)
+    write(set_store_icon(user.store.id, filename))
+    item_listing_cache.invalidate(store_tag(user.store.id))
     return Response(content=None, status_code=204)
 
 @router.delete("/icon")
-def delete_user_store_icon(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_user_store_icon(user: User = Depends(get_current_user), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
-    user.store.icon = None
-    db.commit()
+    write(set_store_icon(user.store.id, None))
+    item_listing_cache.invalidate(store_tag(user.store.id))
     return Response(content=None, status_code=204)
 
 @router.get("/items", response_model=Page[FullItemSchema], status_code=200)
@@ -100,11 +120,15 @@ def get_user_store_items(query: ItemQuerySchema = Depends(), user: User = Depend
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     
-    items_query = db.query(Item).filter(Item.store_id == user.store.id)
+    items_query = db.query(Item).options(*full_item_options).filter(Item.store_id == user.store.id)
 
+    rank = None
     if query.name is not None:
-        names = query.name.split(" ")
-        items_query = items_query.filter(or_(*[Item.name.like(f"%{name}%") for name in names]))
+        if query.search_mode == ItemSearchModeEnum.FULLTEXT:
+            items_query, rank = search_items(items_query, query.name)
+        else:
+            names = query.name.split(" ")
+            items_query = items_query.filter(or_(*[Item.name.like(f"%{name}%") for name in names]))
 
     if query.order_by is not None:
         if query.order_by == ItemQueryOrderByEnum.ID:
@@ -118,18 +142,79 @@ def get_user_store_items(query: ItemQuerySchema = Depends(), user: User = Depend
         elif query.order_by == ItemQueryOrderByEnum.BEST:
             items_query = items_query.order_by(desc(Item.average_stars ) if query.desc is True else Item.average_stars).order_by(Item.id if query.desc is True else desc(Item.id))
     else:
+        if rank is not None:
+            items_query = items_query.order_by(rank)
         items_query = items_query.order_by(Item.id if query.desc is True else desc(Item.id))
     
     return paginate(items_query)
 
 @router.post("/items", response_model=FullItemSchema)
-def create_item_for_user_store(data: CUItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def create_item_for_user_store(data: CUItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
-    item = Item(**data.model_dump(), store_id=user.store.id)
-    db.add(item)
-    db.commit()
-    return item
+    store_id = user.store.id
+    def work(session: Session):
+        item = Item(**data.model_dump(), store_id=store_id)
+        session.add(item)
+        session.flush()
+        return item.id
+    item_id = write(work)
+    item_listing_cache.clear()
+    return db.get(Item, item_id)
+
+@router.post("/items/import", response_model=ItemImportResultSchema)
+def import_items_to_user_store(file: UploadFile, format: ItemBulkFormatEnum = ItemBulkFormatEnum.CSV, user: User = Depends(get_current_user), write = Depends(get_writer)):
+    if not user.store:
+        return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
+    store_id = user.store.id
+    result = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+    #批次寫入時才發現的錯誤會排在同一批後面幾行的格式錯誤之後，只保留行號最小的item_import_max_errors筆
+    def trim_errors():
+        result["errors"].sort(key=lambda error: error["line"])
+        del result["errors"][settings.item_import_max_errors:]
+    def fail(line: int, message: str):
+        result["failed"] += 1
+        result["errors"].append({"line": line, "message": message})
+        if len(result["errors"]) > settings.item_import_max_errors * 2:
+            trim_errors()
+    def flush(batch: list):
+        if not batch:
+            return
+        created, updated, errors = write(partial(upsert_catalog, store_id=store_id, rows=batch))
+        result["created"] += created
+        result["updated"] += updated
+        for line, message in errors:
+            fail(line, message)
+    batch = []
+    for line, row, error in read_catalog(file.file, format):
+        if error is None:
+            try:
+                batch.append((line, *parse_catalog_row(row)))
+            except ValueError as exc:
+                error = str(exc)
+        if error is not None:
+            fail(line, error)
+            continue
+        if len(batch) >= settings.item_import_batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+    trim_errors()
+    if result["created"] or result["updated"]:
+        item_listing_cache.clear()
+    return result
+
+@router.get("/items/export")
+def export_items_from_user_store(format: ItemBulkFormatEnum = ItemBulkFormatEnum.CSV, user: User = Depends(get_current_user)):
+    if not user.store:
+        return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
+    store_id = user.store.id
+    #get_db的工作階段在回應開始傳送前就會關閉，串流時另外開一個
+    def content():
+        with ReadSessionLocal() as db:
+            yield from write_catalog(db, store_id, format, settings.item_export_batch_size)
+    media_type = "text/csv; charset=utf-8" if format == ItemBulkFormatEnum.CSV else "application/x-ndjson"
+    return StreamingResponse(content(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="items.{format.value}"'})
 
 @router.get("/items/{item_id}", response_model=FullItemSchema)
 def get_item_from_user_store(item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -141,23 +226,33 @@ def get_item_from_user_store(item_id: int, user: User = Depends(get_current_user
     return item
 
 @router.put("/items/{item_id}", response_model=FullItemSchema)
-def update_item_from_user_store(item_id: int, data: CUItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_item_from_user_store(item_id: int, data: CUItemSchema, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     item = db.query(Item).filter(Item.id == item_id, Item.store_id == user.store.id).first()
     if not item:
         return JSONResponse(content={"message": "資源不存在或無權存取"}, status_code=400)
-    item.name = data.name
-    item.introduction = data.introduction
-    item.count = data.count
-    item.price = data.price
-    item.need_18 = data.need_18
-    db.commit()
+    def work(session: Session):
+        target = session.get(Item, item_id)
+        target.name = data.name
+        target.introduction = data.introduction
+        #可賣出的庫存，不含未出貨訂單已預留的數量(見app.models.inventory)
+        target.count = data.count
+        target.price = data.price
+        target.need_18 = data.need_18
+    #名稱、介紹、價格與18禁會影響篩選與排序，只改數量時只需要讓含有本商品的頁面失效
+    listing_changed = (item.name, item.introduction, item.price, item.need_18) != (data.name, data.introduction, data.price, data.need_18)
+    write(work)
+    if listing_changed:
+        item_listing_cache.clear()
+    else:
+        item_listing_cache.invalidate(item_tag(item_id))
+    db.refresh(item)
     return item
 
 #刪除使用者商店中的特定物品
 @router.delete("/items/{item_id}")
-def delete_item_from_user_store(item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_item_from_user_store(item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     item = db.query(Item).filter(Item.id == item_id, Item.store_id == user.store.id).first()
@@ -172,51 +267,45 @@ def delete_item_from_user_store(item_id: int, user: User = Depends(get_current_u
     order_exist = db.query(Order).filter(Order.item_id == item_id, Order.status != OrderStatus.DONE.value).first()
     if order_exist:
         return JSONResponse(content={"message": "尚有包含本商品且未完成的訂單"}, status_code=400)
-    item_reports = db.query(ItemReport).filter(ItemReport.reported_item_id == item_id).all()
+    def work(session: Session):
+        item_reports = session.query(ItemReport).filter(ItemReport.reported_item_id == item_id).all()
 
-    for item_report in item_reports:
-        db.delete(item_report)
-        
-    db.delete(item)
-    db.commit()
+        for item_report in item_reports:
+            session.delete(item_report)
+
+        item = session.get(Item, item_id)
+        #商店頁面包含商品清單，刪除商品時一併更新商店的修改時間
+        item.store.updated_at = datetime.now()
+        session.delete(item)
+    write(work)
+    item_listing_cache.clear()
     return Response(content=None, status_code=204)
 
 @router.put("/items/{item_id}/icon")
-def update_item_icon_from_user_store(item_id: int, icon: UploadFile, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_item_icon_from_user_store(item_id: int, icon: UploadFile, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     item = db.query(Item).filter(Item.id == item_id, Item.store_id == user.store.id).first()
     if not item:
         return JSONResponse(content={"message": "資源不存在或無權存取"}, status_code=400)
-    if icon.content_type != "image/jpeg" and icon.content_type != "image/png":
-        return JSONResponse(content={"message": "只接受.jpeg和.png檔案"}, status_code=400)
-    if icon.size > 2048 * 2048:
-        return JSONResponse(content={"message": "icon大小請勿超過1MB"}, status_code=400)
-    icon.file.seek(0)
-    filename = str(uuid.uuid4())
-    if icon.content_type == "image/jpeg":
-        filename = filename + ".jpg"
-    elif icon.content_type == "image/png":
-        filename = filename + ".png"
-    with open(f"{settings.static_files_root}/{filename}", "wb") as image:
-        image.write(icon.file.read())
-    item.icon = filename
-    db.commit()
+    filename = save_image(icon)
+    write(set_item_icon(item.id, filename))
+    item_listing_cache.invalidate(item_tag(item.id))
     return Response(content=None, status_code=204)
 
 @router.delete("/items/{item_id}/icon")
-def delete_item_icon_from_user_store(item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_item_icon_from_user_store(item_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     item = db.query(Item).filter(Item.id == item_id, Item.store_id == user.store.id).first()
     if not item:
         return JSONResponse(content={"message": "資源不存在或無權存取"}, status_code=400)
-    db.delete(item.icon)
-    db.commit()
+    write(set_item_icon(item.id, None))
+    item_listing_cache.invalidate(item_tag(item.id))
     return Response(status_code=204)
 
 @router.post("/items/{item_id}/images")
-def add_item_images_from_user_store(item_id: int, images: list[UploadFile], user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def add_item_images_from_user_store(item_id: int, images: list[UploadFile], user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     item = db.query(Item).filter(Item.id == item_id, Item.store_id == user.store.id).first()
@@ -224,29 +313,16 @@ def add_item_images_from_user_store(item_id: int, images: list[UploadFile], user
         return JSONResponse(content={"message": "資源不存在或無權存取"}, status_code=400)
     if len(images) > 10:
         return JSONResponse(content={"message": "一次最多只能上傳10張圖片"}, status_code=400)
-    for img in images:
-        if img.content_type != "image/jpeg" and img.content_type != "image/png":
-            return JSONResponse(content={"message": "只接受.jpeg和.png檔案"}, status_code=400)
-        if img.size > 2048 * 2048:
-            return JSONResponse(content={"message": "圖片大小請勿超過1MB"}, status_code=400)
-    item_images = []
-    for img in images:
-        img.file.seek(0)
-        filename = str(uuid.uuid4())
-        if img.content_type == "image/jpeg":
-            filename = filename + ".jpg"
-        elif img.content_type == "image/png":
-            filename = filename + ".png"
-        with open(f"{settings.static_files_root}/{filename}", "wb") as image:
-            image.write(img.file.read())
-        item_image = ItemImage(item_id=item_id, path=filename)
-        item_images.append(item_image)
-    db.add_all(item_images)
-    db.commit()
+    filenames = save_images(images)
+    def work(session: Session):
+        session.add_all([ItemImage(item_id=item_id, path=filename) for filename in filenames])
+        session.get(Item, item_id).updated_at = datetime.now()
+    write(work)
+    item_listing_cache.invalidate(item_tag(item_id))
     return Response(content=None, status_code=204)
 
 @router.put("/items/{item_id}/images")
-def fully_update_item_images_from_user_store(item_id: int, images: list[UploadFile], user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def fully_update_item_images_from_user_store(item_id: int, images: list[UploadFile], user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     item = db.query(Item).filter(Item.id == item_id, Item.store_id == user.store.id).first()
@@ -254,39 +330,28 @@ def fully_update_item_images_from_user_store(item_id: int, images: list[UploadFi
         return JSONResponse(content={"message": "資源不存在或無權存取"}, status_code=400)
     if len(images) > 10:
         return JSONResponse(content={"message": "一次最多只能上傳10張圖片"}, status_code=400)
-    for img in images:
-        if img.content_type != "image/jpeg" and img.content_type != "image/png":
-            return JSONResponse(content={"message": "只接受.jpeg和.png檔案"}, status_code=400)
-        if img.size > 2048 * 2048:
-            return JSONResponse(content={"message": "圖片大小請勿超過1MB"}, status_code=400)
-    item_images = []
-    for img in images:
-        img.file.seek(0)
-        filename = str(uuid.uuid4())
-        if img.content_type == "image/jpeg":
-            filename = filename + ".jpg"
-        elif img.content_type == "image/png":
-            filename = filename + ".png"
-        with open(f"{settings.static_files_root}/{filename}", "wb") as image:
-            image.write(img.file.read())
-        item_image = ItemImage(item_id=item_id, path=filename)
-        item_images.append(item_image)
-    for item_img in item.images:
-        db.delete(item_img)
-    for item_image in item_images:
-        db.add_all(item_images)
-    db.commit()
+    filenames = save_images(images)
+    def work(session: Session):
+        for item_img in session.get(Item, item_id).images:
+            session.delete(item_img)
+        session.add_all([ItemImage(item_id=item_id, path=filename) for filename in filenames])
+        session.get(Item, item_id).updated_at = datetime.now()
+    write(work)
+    item_listing_cache.invalidate(item_tag(item_id))
     return Response(content=None, status_code=204)
 
-@router.get("/orders", response_model=Page[FullOrderSchema])
-def get_store_orders(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/orders", response_model=Page[FullOrderSchema] | CursorPage[FullOrderSchema], dependencies=[Depends(pagination_ctx(Page[FullOrderSchema]))])
+def get_store_orders(paging: PagingQuerySchema = Depends(), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
-    orders_query = db.query(Order).join(Item, Order.item_id == Item.id).filter(Item.store_id == user.store.id).order_by(desc(Order.id), Order.status)
+    order_keys = [(Order.id, True), (Order.status, False)]
+    orders_query = db.query(Order).options(joinedload(Order.owner), joinedload(Order.item).options(*full_item_options)).join(Item, Order.item_id == Item.id).filter(Item.store_id == user.store.id).order_by(*order_clauses(order_keys))
+    if paging.paging == PagingModeEnum.CURSOR:
+        return cursor_paginate(orders_query, order_keys, paging.cursor, CursorPage[FullOrderSchema])
     return paginate(orders_query)
 
 @router.put("/orders/{order_id}", response_model=FullOrderSchema)
-def update_store_order(order_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def update_store_order(order_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     order = db.query(Order).filter(Order.id == order_id).first()
@@ -294,17 +359,22 @@ def update_store_order(order_id: int, user: User = Depends(get_current_user), db
         return JSONResponse(content={"message": "訂單不存在"}, status_code=404)
     if order.item.store_id != user.store.id:
         return JSONResponse(content={"message": "訂單不存在"}, status_code=404)
-    if order.item.count < order.count:
-        return JSONResponse(content={"message": "商品數量不足，請補貨。"}, status_code=400)
     if order.status != OrderStatus.NOT_DELIVERED.value:
         return JSONResponse(content={"message": "商品已出貨或已完成"}, status_code=400)
-    order.status = OrderStatus.PROCESSING.value
-    order.item.count = order.item.count - order.count
-    db.commit()
+    #庫存在下單時已預留，只有舊訂單會在這裡扣庫存
+    try:
+        fulfilled = write(partial(fulfil_order, order_id=order_id))
+    except OutOfStockException:
+        return JSONResponse(content={"message": "商品數量不足，請補貨。"}, status_code=400)
+    if not fulfilled:
+        return JSONResponse(content={"message": "商品已出貨或已完成"}, status_code=400)
+    item_listing_cache.invalidate(item_tag(order.item_id))
+    db.refresh(order)
+    db.refresh(order.item)
     return order
 
 @router.delete("/orders/{order_id}")
-def delete_store_order(order_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def delete_store_order(order_id: int, user: User = Depends(get_current_user), db: Session = Depends(get_db), write = Depends(get_writer)):
     if not user.store:
         return JSONResponse(content={"message": "你尚未創建商店"}, status_code=400)
     order = db.query(Order).filter(Order.id == order_id).first()
@@ -314,8 +384,10 @@ def delete_store_order(order_id: int, user: User = Depends(get_current_user), db
         return JSONResponse(content={"message": "訂單不存在"}, status_code=404)
     if order.status != OrderStatus.NOT_DELIVERED.value:
         return JSONResponse(content={"message": "商品已出貨或已完成"}, status_code=400)
-    db.delete(order)
-    db.commit()
+    item_id = order.item_id
+    if not write(partial(cancel_order, order_id=order_id)):
+        return JSONResponse(content={"message": "商品已出貨或已完成"}, status_code=400)
+    item_listing_cache.invalidate(item_tag(item_id))
     return Response(status_code=204)
 
 add_pagination(router)
\ No newline at end of file
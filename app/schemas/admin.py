@@ -59,4 +59,82 @@ class UserQuerySchema(BaseModel):
 
 
 class CUAdSchema(BaseModel):
-    url: str
\ No newline at end of file
+    url: str
+    weight: int = 1
+
+
+class WriterStatsSchema(BaseModel):
+    enabled: bool
+    running: bool
+    queue_depth: int
+    queue_size: int
+    batches: int
+    transactions: int
+    failed: int
+    rejected: int
+    last_batch_size: int
+    avg_batch_size: float
+    avg_wait_ms: float
+    last_commit_ms: float
+    avg_commit_ms: float
+    max_commit_ms: float
+
+
+class ItemCacheStatsSchema(BaseModel):
+    enabled: bool
+    entries: int
+    max_entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
+
+
+class PasswordHasherStatsSchema(BaseModel):
+    running: bool
+    workers: int
+    rounds: int
+    pending: int
+    max_pending: int
+    hashed: int
+    verified: int
+    rehashed: int
+    rejected: int
+    avg_ms: float
+
+
+class MailStatsSchema(BaseModel):
+    running: bool
+    queue_depth: int
+    queue_size: int
+    batches: int
+    sent: int
+    failed: int
+    retried: int
+    rejected: int
+    connections: int
+
+
+class ImageStatsSchema(BaseModel):
+    blobs: int
+    referenced: int
+    released: int
+    references: int
+
+
+class ImageVariantStatsSchema(BaseModel):
+    running: bool
+    workers: int
+    rendering: int
+    rendered: int
+    rejected: int
+    avg_ms: float
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
\ No newline at end of file
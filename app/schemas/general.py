@@ -1,8 +1,12 @@
 from pydantic import BaseModel
 
 from datetime import datetime
+from typing import Generic, TypeVar
 
-from app.enums.base import ItemQueryOrderByEnum
+from app.enums.base import ItemQueryOrderByEnum, ItemSearchModeEnum, PagingModeEnum
+
+
+T = TypeVar("T")
 
 
 class BaseResourceSchema(BaseModel):
@@ -37,6 +41,12 @@ class TokenSchema(BaseModel):
     refresh_token: str
 
 
+class PrincipalSchema(BaseModel):
+    id: int
+    username: str
+    is_admin: bool
+
+
 class CitySchema(BaseResourceSchema):
     name: str
 
@@ -124,11 +134,23 @@ class FullDistrictSchema(DistrictSchema):
 
 class ItemQuerySchema(BaseModel):
     name: str | None = None
+    search_mode: ItemSearchModeEnum | None = None
     order_by: ItemQueryOrderByEnum | None = None
     desc: bool | None = None
     need18: bool | None = None
 
 
+class PagingQuerySchema(BaseModel):
+    paging: PagingModeEnum = PagingModeEnum.OFFSET
+    cursor: str | None = None
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: list[T]
+    size: int
+    next_cursor: str | None
+
+
 class OrderSchema(BaseResourceSchema):
     item_id: int
     count: int
@@ -146,6 +168,7 @@ class FullOrderSchema(OrderSchema):
 class AdSchema(BaseResourceSchema):
     url: str
     icon: str | None = None
+    weight: int = 1
 
 
 class CUForgetPwSchema(BaseModel):
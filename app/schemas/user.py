@@ -15,6 +15,19 @@ class CUItemSchema(BaseModel):
     need_18: bool
 
 
+class ItemImportErrorSchema(BaseModel):
+    line: int
+    message: str
+
+
+class ItemImportResultSchema(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    #最多item_import_max_errors筆
+    errors: list[ItemImportErrorSchema]
+
+
 class CUItemOptionTitleSchema(BaseModel):
     name: str
 
@@ -11,6 +11,68 @@ class Settings(BaseSettings):
     app_port: int = 8000
 
     db_connection: str = "sqlite:///database.sqlite3"
+    async_db_connection: str | None = None
+    read_db_connection: str | None = None
+    async_read_db_connection: str | None = None
+
+    sqlite_profile_enabled: bool = True
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 5000
+    sqlite_cache_size: int = -64000
+    sqlite_mmap_size: int = 268435456
+    sqlite_temp_store: str = "MEMORY"
+    #SQLite預設不檢查外鍵，打開後刪除仍有訂單(ondelete="RESTRICT")的商品或商店會失敗，路由尚未處理這種情況
+    sqlite_foreign_keys: bool = False
+
+    sql_capture_file: str | None = None
+
+    write_serializer_enabled: bool = False
+    write_queue_size: int = 1000
+    write_batch_size: int = 32
+    write_batch_wait_ms: int = 2
+    write_submit_timeout_ms: int = 1000
+
+    bcrypt_rounds: int = 12
+    #0表示不啟動行程池，直接在請求的執行緒上計算
+    password_hash_workers: int = 0
+    password_hash_max_pending: int = 8
+    password_hash_timeout_ms: int = 2000
+
+    popularity_refresh_seconds: int = 300
+    popularity_window_days: int = 30
+    popularity_half_life_days: float = 7
+    popularity_size: int = 1000
+
+    ad_pool_ttl_seconds: int = 60
+    reference_cache_ttl_seconds: int = 300
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_max_entries: int = 10000
+
+    item_cache_ttl_seconds: int = 30
+    item_cache_max_entries: int = 2048
+    item_cache_max_bytes: int = 32 * 1024 * 1024
+
+    item_import_batch_size: int = 1000
+    item_import_max_errors: int = 100
+    item_export_batch_size: int = 1000
+
+    upload_max_file_bytes: int = 4 * 1024 * 1024
+    upload_max_request_bytes: int = 41 * 1024 * 1024
+    #multipart的邊界與欄位標頭
+    upload_multipart_overhead_bytes: int = 16 * 1024
+    upload_chunk_bytes: int = 64 * 1024
+
+    image_variant_root: str = "app/variants"
+    image_variant_max_bytes: int = 256 * 1024 * 1024
+    image_variant_quality: int = 80
+    image_variant_workers: int = 2
+    image_variant_max_pending: int = 8
+    image_variant_timeout_ms: int = 10000
+
+    image_gc_interval_seconds: int = 86400
+    image_gc_grace_seconds: int = 86400
+    image_gc_batch_size: int = 500
 
     mail_username: str
     mail_password: str
@@ -22,6 +84,19 @@ class Settings(BaseSettings):
     mail_ssl_tls: bool = False
     mail_use_credentials: bool = True
     mail_validate_certs: bool = True
+    mail_queue_size: int = 1000
+    mail_batch_size: int = 20
+    mail_max_retries: int = 3
+    mail_retry_delay_ms: int = 1000
+    mail_idle_timeout_seconds: float = 30
+    mail_submit_timeout_ms: int = 1000
+
+    email_outbox_poll_seconds: float = 5
+    email_outbox_batch_size: int = 50
+    email_outbox_lease_seconds: float = 300
+    email_outbox_max_attempts: int = 8
+    email_outbox_backoff_seconds: float = 30
+    email_outbox_retention_hours: float = 168
 
     secret_key: str
     algorithm: str = "HS256"
@@ -0,0 +1,141 @@
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, func, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.dependencies.base import apply_sqlite_profile
+from app.exceptions.base import OutOfStockException
+from app.models.inventory import cancel_order, fulfil_order, place_orders
+from app.models.models import Base, City, District, Item, Order, Store, User
+
+
+def setup(db_path: str, stock: int, clients: int):
+    engine = create_engine(f"sqlite:///{db_path}", pool_size=clients)
+    event.listen(engine, "connect", apply_sqlite_profile)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(engine, autoflush=False)
+    with Session() as db:
+        city = City(name="city")
+        db.add(city)
+        db.flush()
+        district = District(name="district", city_id=city.id)
+        users = [User(username=f"user{i}", email=f"user{i}@example.com", password="x", birthday=datetime(2000, 1, 1)) for i in range(clients + 1)]
+        db.add(district)
+        db.add_all(users)
+        db.flush()
+        store = Store(name="store", introduction="", user_id=users[0].id, district_id=district.id)
+        db.add(store)
+        db.flush()
+        item = Item(name="item", introduction="", count=stock, price=100, store_id=store.id)
+        db.add(item)
+        db.commit()
+        return engine, Session, item.id, [user.id for user in users[1:]]
+
+def run(mode: str, db_path: str, stock: int, clients: int, attempts: int, cancel_rate: float):
+    engine, Session, item_id, user_ids = setup(db_path, stock, clients)
+    counts = {"accepted": 0, "rejected": 0, "cancelled": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def reserve_client(user_id: int):
+        accepted = rejected = cancelled = locked = 0
+        for _ in range(attempts):
+            order = {"item_id": item_id, "user_id": user_id, "count": 1, "total_price": 100, "address": "a"}
+            try:
+                with Session() as db:
+                    try:
+                        order_id = place_orders(db, [order])[0]
+                        db.commit()
+                    except OutOfStockException:
+                        rejected += 1
+                        continue
+                    accepted += 1
+                    if random.random() < cancel_rate:
+                        cancelled += cancel_order(db, order_id)
+                    else:
+                        fulfil_order(db, order_id)
+                    db.commit()
+            except OperationalError:
+                locked += 1
+        with lock:
+            counts["accepted"] += accepted - cancelled
+            counts["rejected"] += rejected
+            counts["cancelled"] += cancelled
+            counts["locked"] += locked
+
+    def read_check_write_client(user_id: int):
+        #修改前的作法：建立訂單時不預留，出貨時讀出庫存、在Python中檢查後再把計算結果寫回
+        accepted = rejected = locked = 0
+        for _ in range(attempts):
+            try:
+                with Session() as db:
+                    count = db.scalar(select(Item.count).where(Item.id == item_id))
+                    if count < 1:
+                        rejected += 1
+                        continue
+                    db.add(Order(item_id=item_id, user_id=user_id, count=1, total_price=100, address="a", status=3))
+                    db.execute(update(Item).where(Item.id == item_id).values(count=count - 1))
+                    db.commit()
+                    accepted += 1
+            except OperationalError:
+                locked += 1
+        with lock:
+            counts["accepted"] += accepted
+            counts["rejected"] += rejected
+            counts["locked"] += locked
+
+    target = reserve_client if mode == "reserve" else read_check_write_client
+    threads = [threading.Thread(target=target, args=(user_id,)) for user_id in user_ids]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    with Session() as db:
+        remaining = db.scalar(select(Item.count).where(Item.id == item_id))
+        ordered = db.scalar(select(func.coalesce(func.sum(Order.count), 0)).where(Order.item_id == item_id))
+    engine.dispose()
+    return {
+        **counts,
+        "requests/s": clients * attempts / elapsed,
+        "remaining": remaining,
+        "ordered": ordered,
+        #大於0表示超賣
+        "oversold": max(ordered - stock, 0),
+        "consistent": remaining >= 0 and remaining + ordered == stock,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多個客戶端同時搶購同一個商品，檢查庫存預留是否會超賣")
+    parser.add_argument("--modes", nargs="+", choices=["read-check-write", "reserve"], default=["read-check-write", "reserve"])
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=50)
+    parser.add_argument("--cancel-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'mode':<18}{'requests/s':>12}{'accepted':>10}{'rejected':>10}{'cancelled':>11}{'locked':>8}{'remaining':>11}{'oversold':>10}{'consistent':>12}")
+    failed = False
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run(mode, os.path.join(tmp, "bench.sqlite3"), args.stock, args.clients, args.attempts, args.cancel_rate)
+        print(
+            f"{mode:<18}{result['requests/s']:>12.1f}{result['accepted']:>10}{result['rejected']:>10}{result['cancelled']:>11}"
+            f"{result['locked']:>8}{result['remaining']:>11}{result['oversold']:>10}{str(result['consistent']):>12}"
+        )
+        failed = failed or (mode == "reserve" and not result["consistent"])
+    if failed:
+        raise SystemExit("庫存預留後庫存與訂單數量不一致")
+
+
+if __name__ == "__main__":
+    main()
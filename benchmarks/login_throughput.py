@@ -0,0 +1,70 @@
+import argparse
+import statistics
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app.dependencies.password_hasher import PasswordHasher, hash_password
+
+
+def run(workers: int, rounds: int, clients: int, seconds: float, hashed_password: str):
+    hasher = PasswordHasher(workers=workers, max_pending=max(workers, 1) * 2, timeout_ms=60000, rounds=rounds)
+    hasher.start()
+    #先讓子行程都啟動，不把啟動時間算進去
+    for _ in range(max(workers, 1)):
+        hasher.verify_and_update("password", hashed_password)
+
+    counts = {"login": 0, "rejected": 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def login():
+        done = 0
+        while time.perf_counter() < deadline:
+            hasher.verify_and_update("password", hashed_password)
+            done += 1
+        with lock:
+            counts["login"] += done
+
+    def other_request():
+        #模擬同時進來的一般請求，量測在登入尖峰時的延遲
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            sum(range(2000))
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    #和FastAPI同步路由一樣共用同一個執行緒池
+    with ThreadPoolExecutor(max_workers=clients + 1) as pool:
+        futures = [pool.submit(login) for _ in range(clients)] + [pool.submit(other_request)]
+        for future in futures:
+            future.result()
+    hasher.stop()
+    latencies.sort()
+    #一般請求完全沒有機會執行時沒有延遲可算，以nan表示
+    return {
+        "logins": counts["login"] / seconds,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較不同密碼雜湊行程池大小下的登入吞吐量")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    hashed_password = hash_password("password", args.rounds)
+    print(f"{'workers':<10}{'logins/s':>12}{'other p50 ms':>15}{'other p99 ms':>15}")
+    for workers in args.workers:
+        result = run(workers, args.rounds, args.clients, args.seconds, hashed_password)
+        print(f"{workers if workers else 'inline':<10}{result['logins']:>12.1f}{result['p50_ms']:>15.2f}{result['p99_ms']:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
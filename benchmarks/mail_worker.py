@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import socket
+import sys
+import threading
+import time
+
+from aiosmtpd.controller import Controller
+
+from fastapi_mail import ConnectionConfig, MessageSchema, MessageType
+
+from app.dependencies.mailer import MailWorker
+
+
+"""
+以本機的aiosmtpd當作SMTP伺服器，實際寄信檢查MailWorker
+
+連線重複使用：同一批郵件只開一條連線
+重試：伺服器停止後再重新啟動，郵件在重試中寄出
+閒置：超過idle_timeout後關閉連線，下一封郵件重新連線
+關閉：stop前已排入佇列的郵件全部寄出
+關閉逾時：伺服器不回應、佇列已滿時，stop在timeout後返回，等待中的send都會收到錯誤
+"""
+
+
+class RecordingHandler:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.subjects: list[str] = []
+        #每條SMTP連線有各自的session
+        self.sessions: set[int] = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        subject = next((line[9:] for line in envelope.content.decode(errors="replace").splitlines() if line.startswith("Subject: ")), "")
+        with self.lock:
+            self.subjects.append(subject)
+            self.sessions.add(id(session))
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def message(subject: str) -> MessageSchema:
+    return MessageSchema(subject=subject, recipients=["user@example.com"], body="body", subtype=MessageType.plain)
+
+def mail_config(port: int) -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="",
+        MAIL_PASSWORD="",
+        MAIL_FROM="bench@example.com",
+        MAIL_PORT=port,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+    )
+
+
+async def run(messages: int, idle_timeout: float) -> list[tuple[str, bool, str]]:
+    port = free_port()
+    handler = RecordingHandler()
+    controllers = [Controller(handler, hostname="127.0.0.1", port=port)]
+    controllers[0].start()
+    worker = MailWorker(
+        config=mail_config(port),
+        queue_size=messages * 2,
+        batch_size=20,
+        max_retries=4,
+        retry_delay_ms=200,
+        idle_timeout_seconds=idle_timeout,
+        submit_timeout_ms=1000,
+    )
+    worker.start()
+    results = []
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[worker.send(message(f"reuse {i}")) for i in range(messages)])
+        elapsed = time.perf_counter() - start
+        stats = worker.stats()
+        results.append((
+            "連線重複使用",
+            stats["sent"] == messages and stats["connections"] == 1 and len(handler.sessions) == 1,
+            f"{messages}封/{stats['connections']}條連線，{messages / elapsed:.0f}封/秒",
+        ))
+
+        #伺服器停止時，worker手上的連線已經斷了，重新啟動前的連線也會被拒絕
+        #Controller停止後不能再啟動，在同一個埠開一個新的
+        controllers[0].stop()
+        controllers.append(Controller(handler, hostname="127.0.0.1", port=port))
+        retried = worker.stats()["retried"]
+        restart = threading.Timer(0.5, controllers[-1].start)
+        restart.start()
+        try:
+            await worker.send(message("retry"))
+            ok, detail = "retry" in handler.subjects, f"重試{worker.stats()['retried'] - retried}次後寄出"
+        except Exception as exc:
+            ok, detail = False, f"重試後仍失敗：{exc!r}"
+        restart.join()
+        results.append(("重試", ok and worker.stats()["retried"] > retried, detail))
+
+        connections = worker.stats()["connections"]
+        await asyncio.sleep(idle_timeout * 2)
+        closed = worker.smtp is None
+        await worker.send(message("after idle"))
+        results.append((
+            "閒置關閉",
+            closed and worker.stats()["connections"] == connections + 1,
+            f"閒置{idle_timeout * 2:.1f}秒後{'已' if closed else '未'}關閉連線",
+        ))
+
+        #排入佇列後不等寄出就立刻關閉
+        before = len(handler.subjects)
+        sends = [asyncio.create_task(worker.send(message(f"drain {i}"))) for i in range(messages)]
+        await asyncio.sleep(0)
+        queued = worker.stats()["queue_depth"]
+        await worker.stop()
+        await asyncio.gather(*sends, return_exceptions=True)
+        drained = len(handler.subjects) - before
+        results.append(("關閉前寄完", drained == messages, f"關閉時佇列中{queued}封，寄出{drained}/{messages}封"))
+    finally:
+        await worker.stop()
+        controllers[-1].stop()
+    return results
+
+async def run_stop_timeout(timeout: float) -> tuple[str, bool, str]:
+    #只接受連線、不回應SMTP問候的伺服器
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        worker = MailWorker(
+            config=mail_config(server.getsockname()[1]),
+            queue_size=1,
+            batch_size=1,
+            max_retries=0,
+            retry_delay_ms=10,
+            idle_timeout_seconds=60,
+            submit_timeout_ms=100,
+        )
+        worker.start()
+        sends = [asyncio.create_task(worker.send(message(f"stuck {i}"))) for i in range(3)]
+        await asyncio.sleep(0.2)
+        start = time.perf_counter()
+        await worker.stop(timeout=timeout)
+        elapsed = time.perf_counter() - start
+        try:
+            async with asyncio.timeout(1):
+                errors = await asyncio.gather(*sends, return_exceptions=True)
+        except TimeoutError:
+            return ("關閉逾時", False, "關閉後仍有send在等待")
+        failed = sum(isinstance(error, Exception) for error in errors)
+    return ("關閉逾時", elapsed < timeout + 0.5 and failed == len(sends), f"{elapsed:.1f}秒後關閉，{failed}/{len(sends)}個send收到錯誤")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以本機aiosmtpd檢查郵件worker的連線重複使用、重試與關閉時寄完佇列")
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--idle-timeout", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.messages, args.idle_timeout))
+    results.append(asyncio.run(run_stop_timeout(args.idle_timeout)))
+    for name, ok, detail in results:
+        print(f"{'OK' if ok else 'FAIL':<6}{name:<12}{detail}")
+    if not all(ok for _, ok, _ in results):
+        sys.exit("郵件worker檢查失敗")
+
+
+if __name__ == "__main__":
+    main()
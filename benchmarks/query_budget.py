@@ -0,0 +1,102 @@
+import argparse
+import os
+import sys
+import tempfile
+
+from datetime import datetime
+
+
+"""
+實際呼叫商品列表的路由，檢查查詢次數是否超出上限，且不會隨每頁筆數增加(N+1)
+
+資料庫換成暫存的SQLite檔案並關閉列表快取，必須在載入app之前設定環境變數
+"""
+
+#(路徑, 參數, 查詢次數上限)
+ENDPOINTS = [
+    #總筆數、商品與商店、圖片
+    ("/general/items", {}, 3),
+    ("/general/items", {"order_by": "price", "desc": True}, 3),
+    ("/general/items", {"name": "item", "search_mode": "fulltext"}, 3),
+    #游標分頁不查總筆數
+    ("/general/items", {"paging": "cursor"}, 2),
+    ("/general/items/best", {}, 2),
+    #熱門度快取在行程內，只有熱門度不足時補上的最新商品、商品與商店、圖片
+    ("/general/items/hot", {}, 3),
+]
+
+
+def seed(db, items: int):
+    from app.models.models import User, City, District, Store, Item, ItemImage, Comment
+
+    user = User(username="seller", email="seller@example.com", password="x", birthday=datetime(2000, 1, 1))
+    city = City(name="city")
+    db.add_all([user, city])
+    db.flush()
+    district = District(name="district", city_id=city.id)
+    db.add(district)
+    db.flush()
+    store = Store(name="store", introduction="store", user_id=user.id, district_id=district.id)
+    db.add(store)
+    db.flush()
+    for i in range(items):
+        item = Item(name=f"item {i}", introduction="item", price=i, count=1, store_id=store.id)
+        db.add(item)
+        db.flush()
+        db.add_all([ItemImage(item_id=item.id, path=f"{i}-{n}.png") for n in range(3)])
+        db.add_all([Comment(item_id=item.id, user_id=user.id, stars=n % 5 + 1) for n in range(3)])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="檢查商品列表路由的查詢次數是否超出上限")
+    parser.add_argument("--page-sizes", type=int, nargs=2, default=[5, 20])
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DB_CONNECTION"] = f"sqlite:///{tmp.name}/bench.sqlite3"
+    os.environ["READ_DB_CONNECTION"] = ""
+    os.environ["ITEM_CACHE_TTL_SECONDS"] = "0"
+
+    from alembic import command
+    from alembic.config import Config
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from app.dependencies.base import SessionLocal, async_read_engine
+    from main import app
+
+    command.upgrade(Config("alembic.ini"), "head")
+    with SessionLocal() as db:
+        seed(db, max(args.page_sizes) * 2)
+
+    statements = []
+    event.listen(async_read_engine.sync_engine, "before_cursor_execute", lambda conn, cursor, statement, *_: statements.append(statement))
+    #不用with，不啟動lifespan中的背景工作
+    client = TestClient(app)
+
+    failed = False
+    print(f"{'endpoint':<60}" + "".join(f"{f'size={size}':>10}" for size in args.page_sizes) + f"{'budget':>10}")
+    for path, params, budget in ENDPOINTS:
+        #先呼叫一次，不把快取的載入算進去
+        client.get(path, params=params).raise_for_status()
+        counts = []
+        for size in args.page_sizes:
+            statements.clear()
+            response = client.get(path, params={**params, "size": size})
+            response.raise_for_status()
+            counts.append(len(statements))
+        name = f"{path}?{'&'.join(f'{key}={value}' for key, value in params.items())}" if params else path
+        print(f"{name:<60}" + "".join(f"{count:>10}" for count in counts) + f"{budget:>10}")
+        if max(counts) > budget or len(set(counts)) > 1:
+            failed = True
+            for statement in statements:
+                print("    " + statement.splitlines()[0])
+
+    tmp.cleanup()
+    if failed:
+        sys.exit("查詢次數超出上限或隨每頁筆數增加")
+
+
+if __name__ == "__main__":
+    main()
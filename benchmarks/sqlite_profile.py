@@ -0,0 +1,72 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from app.dependencies.base import apply_sqlite_profile
+
+
+def run(db_path: str, use_profile: bool, readers: int, writers: int, seconds: float):
+    engine = create_engine(f"sqlite:///{db_path}", pool_size=readers + writers)
+    if use_profile:
+        event.listen(engine, "connect", apply_sqlite_profile)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bench (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO bench (value) VALUES (:value)"), [{"value": i} for i in range(1000)])
+
+    counts = {"read": 0, "write": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        done = 0
+        with engine.connect() as conn:
+            while time.perf_counter() < deadline:
+                conn.execute(text("SELECT count(*), sum(value) FROM bench WHERE id % 7 = :n"), {"n": done % 7}).one()
+                conn.rollback()
+                done += 1
+        with lock:
+            counts["read"] += done
+
+    def writer():
+        done = locked = 0
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO bench (value) VALUES (:value)"), {"value": done})
+                done += 1
+            except OperationalError:
+                locked += 1
+        with lock:
+            counts["write"] += done
+            counts["locked"] += locked
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    return {key: value / seconds if key != "locked" else value for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較套用與未套用SQLite連線設定時的並行讀寫吞吐量")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10}{'reads/s':>12}{'writes/s':>12}{'locked':>10}")
+    for use_profile in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run(os.path.join(tmp, "bench.sqlite3"), use_profile, args.readers, args.writers, args.seconds)
+        print(f"{'on' if use_profile else 'off':<10}{result['read']:>12.1f}{result['write']:>12.1f}{result['locked']:>10}")
+
+
+if __name__ == "__main__":
+    main()
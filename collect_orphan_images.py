@@ -0,0 +1,21 @@
+import argparse
+
+from app.dependencies.image_gc import collect_orphan_images
+from app.settings.base import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="刪除static_files_root中沒有被引用的圖片")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會回收的數量，不刪除")
+    parser.add_argument("--grace-seconds", type=float, default=settings.image_gc_grace_seconds)
+    parser.add_argument("--batch-size", type=int, default=settings.image_gc_batch_size)
+    args = parser.parse_args()
+
+    report = collect_orphan_images(dry_run=args.dry_run, grace_seconds=args.grace_seconds, batch_size=args.batch_size)
+    print(f"{'(dry run) ' if args.dry_run else ''}掃描{report['scanned']}個檔案，耗時{report['elapsed_ms']:.0f}ms")
+    print(f"孤兒圖片：{report['orphans']}個，{report['orphan_bytes']}位元組")
+    print(f"殘留暫存檔：{report['temp_files']}個，{report['temp_bytes']}位元組")
+    print(f"{'可回收' if args.dry_run else '已回收'}：{report['reclaimed_bytes']}位元組")
+
+if __name__ == "__main__":
+    main()
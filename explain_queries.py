@@ -0,0 +1,139 @@
+"""
+以EXPLAIN QUERY PLAN檢查路由使用的查詢，列出全表掃描
+
+python explain_queries.py                      檢查內建的路由查詢
+python explain_queries.py --capture sql.jsonl  檢查SQL_CAPTURE_FILE記錄下來的實際查詢
+"""
+import argparse
+import json
+import re
+import sys
+
+from sqlalchemy import select, desc, func, or_
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.models import User, Verification, City, District, Store, Item, ItemImage, ItemPopularity, Order, CartItem, BuyNextTimeItem, Comment, ItemReport, Ad, EmailOutbox, ImageBlob, OrderStatus
+from app.enums.base import EmailOutboxStatus
+from app.models.loaders import full_item_options
+from app.models.search import search_items
+from app.models.versions import item_version, store_version, item_comments_version
+from app.dependencies.base import engine
+
+
+PAGE_SIZE = 20
+
+
+def fulltext_item_query(name: str):
+    items_query, rank = search_items(select(Item).options(*full_item_options).filter(Item.need_18 == False), name)
+    return items_query.order_by(rank).order_by(desc(Item.id)).limit(PAGE_SIZE)
+
+#(名稱, 查詢, 可接受全表掃描的資料表)
+#清單類路由本來就要讀整張小表，或是依主鍵順序掃描並以LIMIT截斷，這些不算問題
+ROUTE_QUERIES = [
+    ("GET /general/item", select(Item).options(*full_item_options).filter(Item.need_18 == False).order_by(desc(Item.id)).limit(PAGE_SIZE), {"items"}),
+    ("GET /general/item?order_by=hottest", select(Item).options(*full_item_options).filter(Item.need_18 == False).order_by(desc(Item.comment_counts)).order_by(desc(Item.id)).limit(PAGE_SIZE), set()),
+    ("GET /general/item?order_by=best", select(Item).options(*full_item_options).filter(Item.need_18 == False).order_by(desc(Item.average_stars)).order_by(desc(Item.id)).limit(PAGE_SIZE), set()),
+    ("GET /general/item?search_mode=fulltext", fulltext_item_query("apple banana"), set()),
+    ("GET /general/item/hot", select(ItemPopularity.item_id, ItemPopularity.score), {"item_popularities"}),
+    ("refresh_item_popularity", select(Order.item_id, func.date(Order.created_at), func.sum(Order.count)).where(Order.created_at >= "2026-01-01").group_by(func.date(Order.created_at), Order.item_id), set()),
+    ("GET /general/item/{item_id}", select(Item).options(*full_item_options).filter(Item.id == 1), set()),
+    ("selectinload Item.images", select(ItemImage).filter(ItemImage.item_id.in_([1, 2, 3])), set()),
+    ("item_version", item_version(1), set()),
+    ("store_version", store_version(1), set()),
+    ("item_comments_version", item_comments_version(1), set()),
+    ("GET /general/item/{item_id}/comment", select(Comment).options(selectinload(Comment.user)).filter(Comment.item_id == 1).order_by(Comment.id).limit(PAGE_SIZE), set()),
+    ("PUT /general/item/{item_id}/comment", select(Comment).filter(Comment.item_id == 1, Comment.user_id == 1), set()),
+    ("GET /general/store/{store_id}/item", select(Item).options(*full_item_options).filter(Item.store_id == 1, Item.need_18 == False).order_by(desc(Item.id)).limit(PAGE_SIZE), set()),
+    ("GET /general/city", select(City).order_by(City.id), {"cities"}),
+    ("GET /general/district", select(District).order_by(District.id), {"districts"}),
+    ("selectinload City.districts", select(District).filter(District.city_id.in_([1, 2, 3])), set()),
+    ("AdPool.load", select(Ad).filter(Ad.weight > 0).order_by(desc(Ad.id)), {"ads"}),
+    ("get_current_user", select(User).filter(User.username == "admin"), set()),
+    ("PUT /user", select(User).filter(User.id != 1, or_(User.username == "admin", User.email == "admin@example.com")), set()),
+    ("POST /auth/verify", select(Verification).filter(Verification.code == "000000"), set()),
+    ("GET /user/order", select(Order).options(joinedload(Order.item).options(*full_item_options)).filter(Order.user_id == 1), set()),
+    ("GET /user/cart_item", select(CartItem).options(selectinload(CartItem.item)).filter(CartItem.user_id == 1), set()),
+    ("DELETE /user/cart_item/{cart_item_id}", select(CartItem).filter(CartItem.user_id == 1, CartItem.id == 1), set()),
+    ("GET /user/buy_next_time_item", select(BuyNextTimeItem).options(selectinload(BuyNextTimeItem.item).options(*full_item_options)).filter(BuyNextTimeItem.user_id == 1), set()),
+    ("POST /user/buy_next_time_item", select(BuyNextTimeItem).filter(BuyNextTimeItem.user_id == 1, BuyNextTimeItem.item_id == 1), set()),
+    ("GET /user/store/item", select(Item).options(*full_item_options).filter(Item.store_id == 1).order_by(desc(Item.id)).limit(PAGE_SIZE), set()),
+    ("DELETE /user/store/item/{item_id} (buy_next_time_items)", select(BuyNextTimeItem).filter(BuyNextTimeItem.item_id == 1), set()),
+    ("DELETE /user/store/item/{item_id} (cart_items)", select(CartItem).filter(CartItem.item_id == 1), set()),
+    ("DELETE /user/store/item/{item_id} (orders)", select(Order).filter(Order.item_id == 1, Order.status != OrderStatus.DONE.value), set()),
+    ("DELETE /user/store/item/{item_id} (item_reports)", select(ItemReport).filter(ItemReport.reported_item_id == 1), set()),
+    ("GET /user/store/items/export", select(Item.id, Item.name, Item.introduction, Item.count, Item.price, Item.need_18).where(Item.store_id == 1).order_by(Item.id), set()),
+    ("GET /user/store/order", select(Order).options(joinedload(Order.owner), joinedload(Order.item).options(*full_item_options)).join(Item, Order.item_id == Item.id).filter(Item.store_id == 1).order_by(desc(Order.id), Order.status).limit(PAGE_SIZE), set()),
+    ("OutboxDrainer.drain", select(EmailOutbox.id).where(EmailOutbox.status.in_([EmailOutboxStatus.PENDING.value, EmailOutboxStatus.SENDING.value]), EmailOutbox.next_attempt_at <= "2026-01-01").order_by(EmailOutbox.next_attempt_at).limit(50), set()),
+    ("OutboxDrainer.purge", select(EmailOutbox.id).where(EmailOutbox.status.in_([EmailOutboxStatus.SENT.value, EmailOutboxStatus.FAILED.value]), EmailOutbox.next_attempt_at < "2026-01-01"), set()),
+    ("collect_orphan_images", select(ImageBlob.filename, ImageBlob.ref_count, ImageBlob.released_at).where(ImageBlob.filename.in_(["a.png", "b.png"])), set()),
+    ("DELETE /admin/district/{district_id}", select(Store).filter(Store.district_id == 1), set()),
+    ("DELETE /admin/user/{user_id}", select(Comment.item_id).filter(Comment.user_id == 1).distinct(), set()),
+]
+
+SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+#虛擬資料表有約束條件時(例如FTS5的MATCH)會是 INDEX 0:M2 這類形式，不算全表掃描
+VIRTUAL_INDEX_PATTERN = re.compile(r" VIRTUAL TABLE INDEX \d+:\S+")
+
+
+def explain(conn, statement: str, parameters=()):
+    return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()]
+
+def scanned_table(detail: str) -> str | None:
+    match = SCAN_PATTERN.match(detail)
+    if not match or " USING " in detail or VIRTUAL_INDEX_PATTERN.search(detail):
+        return None
+    return match.group(1)
+
+def full_scans(plan: list[str]) -> list[str]:
+    return [table for table in map(scanned_table, plan) if table]
+
+def report(name: str, statement: str, plan: list[str], allowed: set[str]) -> bool:
+    scans = [table for table in full_scans(plan) if table not in allowed]
+    print(f"{'[全表掃描] ' if scans else '[OK] '}{name}")
+    if scans:
+        print(f"    {statement}")
+    for detail in plan:
+        note = ""
+        if scanned_table(detail):
+            note = "  <-- 預期" if scanned_table(detail) in allowed else "  <-- 全表掃描"
+        elif "USE TEMP B-TREE" in detail:
+            note = "  <-- 需要額外排序"
+        print(f"    {detail}{note}")
+    return not scans
+
+def route_queries():
+    for name, query, allowed in ROUTE_QUERIES:
+        statement = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+        yield name, statement, (), allowed
+
+def captured_queries(path: str):
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            statement = record["statement"]
+            if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")) or statement in seen:
+                continue
+            seen.add(statement)
+            yield " ".join(statement.split())[:80], statement, record["parameters"] or (), set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以EXPLAIN QUERY PLAN檢查查詢是否有全表掃描")
+    parser.add_argument("--capture", help="SQL_CAPTURE_FILE記錄的JSON lines檔案")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite":
+        sys.exit("目前只支援SQLite")
+
+    queries = captured_queries(args.capture) if args.capture else route_queries()
+    failed = 0
+    with engine.connect() as conn:
+        for name, statement, parameters, allowed in queries:
+            if not report(name, statement, explain(conn, statement, parameters), allowed):
+                failed += 1
+    print(f"\n{failed}個查詢有全表掃描" if failed else "\n沒有發現全表掃描")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
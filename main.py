@@ -3,36 +3,68 @@ import random
 import uuid
 import uvicorn
 
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime, timedelta
 
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from fastapi_pagination import add_pagination
 
-from fastapi_mail import FastMail, MessageSchema, MessageType
+from fastapi_mail import MessageSchema, MessageType
 
-from fastapi import Depends, FastAPI, BackgroundTasks, Response
+from fastapi import Depends, FastAPI, Response
 
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
 from app.dependencies.base import get_db, get_password_hash, authenticate_user, create_token, get_current_user_by_refresh_token
-from app.exceptions.base import PermissionException, UnauthenticatedException
+from app.dependencies.writer import write_serializer, get_writer
+from app.dependencies.password_hasher import password_hasher
+from app.dependencies.mailer import mail_worker
+from app.dependencies.outbox import outbox_drainer
+from app.dependencies.uploads import UploadLimitMiddleware, SINGLE_IMAGE_PATHS
+from app.dependencies.image_variants import image_resizer
+from app.dependencies.static_files import ContentStaticFiles
+from app.dependencies.popularity import refresh_popularity_periodically
+from app.dependencies.image_gc import collect_orphan_images_periodically
+from app.exceptions.base import PermissionException, UnauthenticatedException, WriteQueueFullException, InvalidCursorException, PasswordHasherBusyException, UnsupportedImageException, ImageTooLargeException, ImageResizerBusyException, OutOfStockException
 from app.models.models import User, Verification
+from app.models.outbox import enqueue_email
 from app.schemas.general import CUForgetPwSchema, ForgetPwCodeConfirmSchema, LoginSchema, RegisterSchema, TokenSchema, UserSchema
 from app.settings.base import settings
-from app.settings.mail import mail_conf
 
 import app.routes.user.root as user_routes
 import app.routes.admin.root as admin_routes
 import app.routes.general.root as general_routes
 
 
-app = FastAPI(title=settings.app_name, description=settings.app_description, version=settings.app_version)
-
-app.mount("/static", StaticFiles(directory=f"{settings.static_files_root}"))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.write_serializer_enabled:
+        write_serializer.start()
+    password_hasher.start()
+    image_resizer.start()
+    mail_worker.start()
+    popularity_task = asyncio.create_task(refresh_popularity_periodically()) if settings.popularity_refresh_seconds > 0 else None
+    outbox_task = asyncio.create_task(outbox_drainer.run()) if settings.email_outbox_poll_seconds > 0 else None
+    image_gc_task = asyncio.create_task(collect_orphan_images_periodically()) if settings.image_gc_interval_seconds > 0 else None
+    yield
+    #等背景工作真的結束後才關閉writer與mailer，避免寄送或寫入到一半時被關閉
+    tasks = [task for task in (popularity_task, outbox_task, image_gc_task) if task]
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    write_serializer.stop()
+    password_hasher.stop()
+    image_resizer.stop()
+    await mail_worker.stop()
+
+app = FastAPI(title=settings.app_name, description=settings.app_description, version=settings.app_version, lifespan=lifespan)
+
+app.mount("/static", ContentStaticFiles(directory=f"{settings.static_files_root}"))
 
 app.include_router(user_routes.router)
 app.include_router(admin_routes.router)
@@ -48,6 +80,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=settings.upload_max_request_bytes,
+    path_limits={path: settings.upload_max_file_bytes + settings.upload_multipart_overhead_bytes for path in SINGLE_IMAGE_PATHS},
+)
+
 @app.exception_handler(UnauthenticatedException)
 def unauthenciated_handler(request, exc):
     return JSONResponse(content={"message": "身分驗證失敗，請重新登入。"}, status_code=401)
@@ -56,6 +94,37 @@ def unauthenciated_handler(request, exc):
 def unauthenciated_handler(request, exc):
     return JSONResponse(content={"message": "身分驗證失敗，請重新登入。"}, status_code=403)
 
+@app.exception_handler(WriteQueueFullException)
+def write_queue_full_handler(request, exc):
+    return JSONResponse(content={"message": "伺服器忙碌中，請稍後再試。"}, status_code=503)
+
+@app.exception_handler(PasswordHasherBusyException)
+def password_hasher_busy_handler(request, exc):
+    return JSONResponse(content={"message": "伺服器忙碌中，請稍後再試。"}, status_code=503)
+
+@app.exception_handler(ImageResizerBusyException)
+def image_resizer_busy_handler(request, exc):
+    return JSONResponse(content={"message": "伺服器忙碌中，請稍後再試。"}, status_code=503)
+
+@app.exception_handler(UnsupportedImageException)
+def unsupported_image_handler(request, exc):
+    extensions = [f".{image_format}" for image_format in exc.formats]
+    if len(extensions) > 1:
+        return JSONResponse(content={"message": f"只接受{'、'.join(extensions[:-1])}和{extensions[-1]}檔案"}, status_code=400)
+    return JSONResponse(content={"message": f"只接受{extensions[0]}檔案"}, status_code=400)
+
+@app.exception_handler(ImageTooLargeException)
+def image_too_large_handler(request, exc):
+    return JSONResponse(content={"message": f"圖片大小請勿超過{exc.max_bytes // (1024 * 1024)}MB"}, status_code=400)
+
+@app.exception_handler(OutOfStockException)
+def out_of_stock_handler(request, exc):
+    return JSONResponse(content={"message": "商品庫存不足"}, status_code=400)
+
+@app.exception_handler(InvalidCursorException)
+def invalid_cursor_handler(request, exc):
+    return JSONResponse(content={"message": "分頁游標無效，請從第一頁重新讀取。"}, status_code=400)
+
 @app.exception_handler(Exception)
 def any_exception_handler(request, exc):
     return JSONResponse(content={"message": "伺服器錯誤，請聯繫伺服器管理員。"}, status_code=500)
@@ -74,26 +143,22 @@ def register(data: RegisterSchema, db: Session = Depends(get_db)):
     return user
 
 @app.post("/login", response_model=TokenSchema, tags=["Auth"])
-def login(data: LoginSchema, db: Session = Depends(get_db)):
-    user = authenticate_user(db=db, username=data.username, password=data.password)
+def login(data: LoginSchema, db: Session = Depends(get_db), write = Depends(get_writer)):
+    user = authenticate_user(db=db, username=data.username, password=data.password, write=write)
     if not user:
         return JSONResponse(content={"message": "使用者名稱或密碼錯誤"}, status_code=401)
-    access_token = create_token({"sub": user.username, "exp": datetime.utcnow() + timedelta(hours=1), "for": "access"})
+    access_token = create_token({"sub": user.username, "uid": user.id, "adm": user.is_admin, "exp": datetime.utcnow() + timedelta(hours=1), "for": "access"})
     refresh_token = create_token({"sub": user.username, "exp": datetime.utcnow() + timedelta(days=3600), "for": "refresh"})
     return {"access_token": access_token, "refresh_token": refresh_token}
 
 @app.post("/refresh", response_model=TokenSchema, tags=["Auth"])
 def login(user: User = Depends(get_current_user_by_refresh_token)):
-    access_token = create_token({"sub": user.username, "exp": datetime.utcnow() + timedelta(hours=1), "for": "access"})
+    access_token = create_token({"sub": user.username, "uid": user.id, "adm": user.is_admin, "exp": datetime.utcnow() + timedelta(hours=1), "for": "access"})
     refresh_token = create_token({"sub": user.username, "exp": datetime.utcnow() + timedelta(days=3600), "for": "refresh"})
     return {"access_token": access_token, "refresh_token": refresh_token}
 
-def send_mail(message: MessageSchema):
-    fm = FastMail(mail_conf)
-    asyncio.run(fm.send_message(message=message))
-
 @app.post("/forget_password")
-def forget_password(data: CUForgetPwSchema, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def forget_password(data: CUForgetPwSchema, db: Session = Depends(get_db)):
     user_exist = db.query(User).filter(User.email == data.email).first()
     if not user_exist:
         return JSONResponse(content={"message": "使用者不存在"}, status_code=404)
@@ -115,14 +180,15 @@ def forget_password(data: CUForgetPwSchema, background_tasks: BackgroundTasks, d
         body=f"你的重設密碼代碼為{verification_code}",
         subtype=MessageType.plain,
     )
+    enqueue_email(db, message)
 
     db.commit()
 
-    background_tasks.add_task(send_mail, message)
+    outbox_drainer.notify()
     return Response(status_code=204)
 
 @app.post("/forget_password_code_confirm")
-def forget_password_code_confirm(data: ForgetPwCodeConfirmSchema, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def forget_password_code_confirm(data: ForgetPwCodeConfirmSchema, db: Session = Depends(get_db)):
     verification = db.query(Verification).filter(Verification.code == data.code).first()
     if not verification:
         return JSONResponse(content={"message": "驗證碼錯誤"}, status_code=400)
@@ -134,17 +200,18 @@ def forget_password_code_confirm(data: ForgetPwCodeConfirmSchema, background_tas
 
     verification.user.password = get_password_hash(new_password)
 
-    db.delete(verification)
-    db.commit()
-
     message = MessageSchema(
         subject="密碼已重設",
         recipients=[verification.user.email],
         body=f"你的新密碼為{new_password}，請盡快再次登入並修改密碼。",
         subtype=MessageType.plain,
     )
+    enqueue_email(db, message)
+
+    db.delete(verification)
+    db.commit()
 
-    background_tasks.add_task(send_mail, message)
+    outbox_drainer.notify()
     return Response(status_code=204)
 
 add_pagination(app)
@@ -0,0 +1,46 @@
+"""Item full text search
+
+Revision ID: 2d25fba44397
+Revises: c87a5a085510
+Create Date: 2026-10-18 10:21:48.369612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d25fba44397'
+down_revision: Union[str, None] = 'c87a5a085510'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE VIRTUAL TABLE items_fts USING fts5(name, introduction, content='items', content_rowid='id', tokenize='trigram')")
+    op.execute(
+        "CREATE TRIGGER items_fts_ai AFTER INSERT ON items BEGIN "
+        "INSERT INTO items_fts(rowid, name, introduction) VALUES (new.id, new.name, new.introduction); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER items_fts_ad AFTER DELETE ON items BEGIN "
+        "INSERT INTO items_fts(items_fts, rowid, name, introduction) VALUES ('delete', old.id, old.name, old.introduction); "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER items_fts_au AFTER UPDATE OF name, introduction ON items BEGIN "
+        "INSERT INTO items_fts(items_fts, rowid, name, introduction) VALUES ('delete', old.id, old.name, old.introduction); "
+        "INSERT INTO items_fts(rowid, name, introduction) VALUES (new.id, new.name, new.introduction); "
+        "END"
+    )
+    op.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS items_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS items_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS items_fts_ai")
+    op.execute("DROP TABLE IF EXISTS items_fts")
@@ -0,0 +1,28 @@
+"""Clear sent email bodies
+
+Revision ID: 6d4586ccb92d
+Revises: 4244db400937
+Create Date: 2026-10-18 14:58:06.317204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d4586ccb92d'
+down_revision: Union[str, None] = '4244db400937'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    #已寄出或已放棄的郵件不會再寄，內文中的驗證碼或新密碼不再保留
+    op.execute("UPDATE email_outbox SET body = '' WHERE status IN (3, 4)")
+
+
+def downgrade() -> None:
+    #清掉的內文無法還原
+    pass
@@ -0,0 +1,30 @@
+"""Updated at columns
+
+Revision ID: 74adcaf111e1
+Revises: 87745ed2f532
+Create Date: 2026-10-18 12:16:44.806113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '74adcaf111e1'
+down_revision: Union[str, None] = '87745ed2f532'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('comments', 'items', 'stores', 'users'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = created_at")
+
+
+def downgrade() -> None:
+    # 不用batch_alter_table，重建items會連同全文檢索的觸發器一起刪掉
+    for table in ('users', 'stores', 'items', 'comments'):
+        op.drop_column(table, 'updated_at')
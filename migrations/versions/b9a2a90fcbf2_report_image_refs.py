@@ -0,0 +1,68 @@
+"""Report image refs
+
+Revision ID: b9a2a90fcbf2
+Revises: 52d91ae54eda
+Create Date: 2026-10-18 14:12:50.106734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9a2a90fcbf2'
+down_revision: Union[str, None] = '52d91ae54eda'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+#檢舉的圖片也要計數，回收程序才不會把它們當成孤兒刪掉
+IMAGE_REFERENCES = [
+    ("item_report_images", "path"),
+    ("user_report_images", "path"),
+]
+
+ACQUIRE = (
+    "INSERT INTO image_blobs(filename, ref_count, released_at, created_at) SELECT {value}, 1, NULL, datetime('now', 'localtime') WHERE {value} IS NOT NULL "
+    "ON CONFLICT(filename) DO UPDATE SET ref_count = ref_count + 1, released_at = NULL;"
+)
+RELEASE = (
+    "UPDATE image_blobs SET ref_count = ref_count - 1, released_at = CASE WHEN ref_count <= 1 THEN datetime('now', 'localtime') ELSE released_at END "
+    "WHERE filename = {value};"
+)
+
+
+def upgrade() -> None:
+    for table, column in IMAGE_REFERENCES:
+        op.execute(
+            f"CREATE TRIGGER {table}_{column}_image_ai AFTER INSERT ON {table} BEGIN "
+            f"{ACQUIRE.format(value=f'new.{column}')} "
+            "END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_{column}_image_ad AFTER DELETE ON {table} BEGIN "
+            f"{RELEASE.format(value=f'old.{column}')} "
+            "END"
+        )
+        op.execute(
+            f"CREATE TRIGGER {table}_{column}_image_au AFTER UPDATE OF {column} ON {table} WHEN old.{column} IS NOT new.{column} BEGIN "
+            f"{RELEASE.format(value=f'old.{column}')} "
+            f"{ACQUIRE.format(value=f'new.{column}')} "
+            "END"
+        )
+        op.execute(
+            "INSERT INTO image_blobs(filename, ref_count, released_at, created_at) "
+            f"SELECT {column}, count(*), NULL, datetime('now', 'localtime') FROM {table} WHERE {column} IS NOT NULL GROUP BY {column} "
+            "ON CONFLICT(filename) DO UPDATE SET ref_count = ref_count + excluded.ref_count, released_at = NULL"
+        )
+
+
+def downgrade() -> None:
+    for table, column in IMAGE_REFERENCES:
+        for suffix in ("au", "ad", "ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_{column}_image_{suffix}")
+        op.execute(
+            f"UPDATE image_blobs SET ref_count = ref_count - (SELECT count(*) FROM {table} WHERE {column} = image_blobs.filename) "
+            f"WHERE filename IN (SELECT {column} FROM {table})"
+        )
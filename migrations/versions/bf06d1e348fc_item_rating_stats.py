@@ -0,0 +1,41 @@
+"""Item rating stats
+
+Revision ID: bf06d1e348fc
+Revises: 186aa23fb349
+Create Date: 2026-10-18 09:12:37.204815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bf06d1e348fc'
+down_revision: Union[str, None] = '186aa23fb349'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('items', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('items', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('items', sa.Column('rating_average', sa.Float(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE items SET "
+        "rating_sum = (SELECT COALESCE(SUM(comments.stars), 0) FROM comments WHERE comments.item_id = items.id), "
+        "rating_count = (SELECT COUNT(comments.id) FROM comments WHERE comments.item_id = items.id), "
+        "rating_average = (SELECT COALESCE(AVG(comments.stars), 0.0) FROM comments WHERE comments.item_id = items.id)"
+    )
+    op.create_index('ix_items_rating_count_id', 'items', ['rating_count', 'id'], unique=False)
+    op.create_index('ix_items_rating_average_id', 'items', ['rating_average', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_items_rating_average_id', table_name='items')
+    op.drop_index('ix_items_rating_count_id', table_name='items')
+    with op.batch_alter_table('items') as batch_op:
+        batch_op.drop_column('rating_average')
+        batch_op.drop_column('rating_count')
+        batch_op.drop_column('rating_sum')
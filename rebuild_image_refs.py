@@ -0,0 +1,10 @@
+from app.models.images import rebuild_image_refs
+from app.dependencies.base import engine
+
+
+def main():
+    with engine.begin() as connection:
+        rebuild_image_refs(connection)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+from app.models.search import rebuild_items_fts
+from app.dependencies.base import engine
+
+
+def main():
+    with engine.begin() as connection:
+        rebuild_items_fts(connection)
+
+if __name__ == "__main__":
+    main()